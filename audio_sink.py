@@ -0,0 +1,306 @@
+import os
+import wave
+import tempfile
+import threading
+import logging
+
+logger = logging.getLogger("audio_sink")
+
+WHISPER_RATE = 16000  # What Whisper models take: 16 kHz mono float32
+
+
+class PcmAudio:
+    """16-bit audio on its way to a backend, written to a WAV file only on demand.
+
+    pcm can be any bytes-like object (such as a view of the capture buffer),
+    so wrapping it copies nothing. from_wav() wraps an existing file instead:
+    its PCM is read on first use and wav_path() is the file itself. Local
+    transcription uses samples(), so only uploads and failed recordings need
+    a file on disk.
+    """
+
+    def __init__(self, pcm, channels, sample_width, rate, path=None):
+        self._pcm = pcm
+        self.channels = channels
+        self.sample_width = sample_width
+        self.rate = rate
+        self.path = path
+        self._owns_path = False  # True once wav_path() has written a temp file
+
+    @classmethod
+    def from_wav(cls, path):
+        with wave.open(path, 'rb') as wf:
+            return cls(None, wf.getnchannels(), wf.getsampwidth(), wf.getframerate(), path=path)
+
+    @property
+    def pcm(self):
+        if self._pcm is None:
+            with wave.open(self.path, 'rb') as wf:
+                self._pcm = wf.readframes(wf.getnframes())
+        return self._pcm
+
+    @property
+    def duration(self):
+        if self._pcm is None:
+            return wav_duration(self.path)
+        return len(self._pcm) // (self.channels * self.sample_width) / self.rate
+
+    def to_mono(self, rate=WHISPER_RATE, block_seconds=1.0):
+        """This audio as mono at rate (itself if it already is), converted in memory.
+
+        The PCM goes through the resampler a block at a time, as captured audio
+        does, so its float intermediates stay the size of one block.
+        """
+        if (self.channels, self.rate) == (1, rate):
+            return self
+        from resample import StreamingResampler
+        resampler = StreamingResampler(self.rate, self.channels, rate)
+        pcm = memoryview(self.pcm).cast('B')
+        frame_bytes = self.channels * self.sample_width
+        block = max(1, int(block_seconds * self.rate)) * frame_bytes
+        out = bytearray(int(len(pcm) // frame_bytes * rate / self.rate + 1) * 2)
+        length = 0
+        for start in range(0, len(pcm) + 1, block):
+            data = resampler.process(pcm[start:start + block]) if start < len(pcm) else resampler.flush()
+            if length + len(data) > len(out):
+                out.extend(bytes(length + len(data) - len(out)))
+            out[length:length + len(data)] = data
+            length += len(data)
+        del out[length:]
+        return PcmAudio(out, 1, 2, rate)
+
+    def samples(self):
+        """Mono float32 samples in [-1, 1), the form faster-whisper takes in memory"""
+        import numpy as np
+        if self.sample_width != 2:
+            raise ValueError("Only 16-bit audio is supported")
+        pcm = np.frombuffer(self.pcm, dtype=np.int16)  # A view of the PCM, not a copy
+        if self.channels > 1:
+            samples = pcm[:len(pcm) - len(pcm) % self.channels].reshape(-1, self.channels).mean(axis=1, dtype=np.float32)
+        else:
+            samples = pcm.astype(np.float32)
+        samples *= 1 / 32768
+        return samples
+
+    def wav_path(self):
+        """A WAV file holding this audio, written the first time one is needed"""
+        if self.path is None:
+            self.path = write_wav_file(self.pcm, self.channels, self.sample_width, self.rate)
+            self._owns_path = True
+        return self.path
+
+    def discard(self):
+        """Delete the temp WAV written by wav_path(), if any"""
+        if self._owns_path:
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+            self.path = None
+            self._owns_path = False
+
+
+def as_audio(audio):
+    """A PcmAudio for either a PcmAudio or a WAV path"""
+    return audio if isinstance(audio, PcmAudio) else PcmAudio.from_wav(audio)
+
+
+class WavFileSink:
+    """Streams captured PCM straight into a WAV file on disk.
+
+    The WAV header is patched after every write, so the file on disk is a valid
+    recording at any point and memory use stays flat however long the session.
+    Without a path, a temp file is created in directory (the system temp dir
+    unless given) with the given prefix.
+    """
+
+    def __init__(self, channels, sample_width, rate, path=None, directory=None, prefix=None):
+        self.channels = channels
+        self.sample_width = sample_width
+        self.rate = rate
+        if path is None:
+            fd, path = tempfile.mkstemp(prefix=prefix, suffix=".wav", dir=directory)
+            os.close(fd)
+        self.path = path
+        self.frames_written = 0
+        self._lock = threading.Lock()
+        self._wav = wave.open(path, 'wb')
+        self._wav.setnchannels(channels)
+        self._wav.setsampwidth(sample_width)
+        self._wav.setframerate(rate)
+
+    @property
+    def duration(self):
+        return self.frames_written / self.rate
+
+    @property
+    def bytes_written(self):
+        return self.frames_written * self.channels * self.sample_width
+
+    def write(self, data):
+        """Append a chunk of raw PCM"""
+        with self._lock:
+            if self._wav is None:
+                return
+            self._wav.writeframes(data)
+            self.frames_written += len(data) // (self.channels * self.sample_width)
+
+    def close(self):
+        """Finalize the WAV file"""
+        with self._lock:
+            if self._wav is not None:
+                self._wav.close()
+                self._wav = None
+
+    def wav_path(self):
+        """Path of a finished WAV file holding the recording"""
+        self.close()
+        return self.path
+
+    def pcm(self):
+        """Read the recorded PCM back from disk"""
+        self.close()
+        with wave.open(self.path, 'rb') as wf:
+            return wf.readframes(wf.getnframes())
+
+    def audio(self):
+        """The finished recording as PcmAudio (backed by the WAV file)"""
+        return PcmAudio.from_wav(self.wav_path())
+
+    def discard(self):
+        """Delete the backing file"""
+        self.close()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+
+class PcmBuffer:
+    """Preallocated, growable in-memory PCM buffer.
+
+    Chunks are copied into one contiguous bytearray (doubling when full) instead
+    of being kept as a list of small bytes objects that must be joined at stop.
+    """
+
+    def __init__(self, channels, sample_width, rate, initial_seconds=60, directory=None, prefix=None):
+        self.channels = channels
+        self.sample_width = sample_width
+        self.rate = rate
+        self.path = None
+        self._directory = directory  # Where wav_path() writes its temp file
+        self._prefix = prefix
+        self._frame_bytes = channels * sample_width
+        self._buffer = bytearray(int(initial_seconds * rate) * self._frame_bytes)
+        self._length = 0
+        self._lock = threading.Lock()
+
+    @property
+    def frames_written(self):
+        return self._length // self._frame_bytes
+
+    @property
+    def duration(self):
+        return self.frames_written / self.rate
+
+    @property
+    def bytes_written(self):
+        return self._length
+
+    def write(self, data):
+        """Append a chunk of raw PCM"""
+        with self._lock:
+            end = self._length + len(data)
+            if end > len(self._buffer):
+                self._buffer.extend(bytes(max(len(self._buffer), end - len(self._buffer))))
+            self._buffer[self._length:end] = data
+            self._length = end
+
+    def close(self):
+        pass
+
+    def pcm(self):
+        """Zero-copy view of the recorded PCM"""
+        return memoryview(self._buffer)[:self._length]
+
+    def audio(self):
+        """The recording as PcmAudio over the buffer itself, with no WAV written"""
+        return PcmAudio(self.pcm(), self.channels, self.sample_width, self.rate)
+
+    def wav_path(self):
+        """Write the buffer to a temporary WAV file and return its path"""
+        if self.path is None:
+            fd, path = tempfile.mkstemp(prefix=self._prefix, suffix=".wav", dir=self._directory)
+            os.close(fd)
+            self.path = write_wav_file(self.pcm(), self.channels, self.sample_width, self.rate, path)
+        return self.path
+
+    def discard(self):
+        """Release the buffer and any temporary file"""
+        if self.path and os.path.exists(self.path):
+            os.unlink(self.path)
+        self.path = None
+        self._buffer = bytearray()
+        self._length = 0
+
+
+class PcmRing:
+    """Fixed-size ring holding the most recent PCM, allocated once.
+
+    Used for pre-roll: the mic stays open between recordings and only the
+    last few seconds are kept, overwriting the oldest audio in place.
+    Callers serialize access.
+    """
+
+    def __init__(self, seconds, channels, sample_width, rate):
+        self._buffer = bytearray(int(seconds * rate) * channels * sample_width)
+        self._end = 0  # Next write position
+        self._length = 0
+
+    @property
+    def bytes_held(self):
+        return self._length
+
+    def write(self, data):
+        """Append PCM, dropping the oldest audio once full"""
+        size = len(self._buffer)
+        if not size:
+            return
+        data = memoryview(data)[-size:]  # Only the newest size bytes can survive
+        first = min(len(data), size - self._end)
+        self._buffer[self._end:self._end + first] = data[:first]
+        self._buffer[:len(data) - first] = data[first:]
+        self._end = (self._end + len(data)) % size
+        self._length = min(size, self._length + len(data))
+
+    def read(self):
+        """The held PCM, oldest first"""
+        start = (self._end - self._length) % len(self._buffer) if self._buffer else 0
+        if start + self._length <= len(self._buffer):
+            return bytes(self._buffer[start:start + self._length])
+        return bytes(self._buffer[start:]) + bytes(self._buffer[:self._end])
+
+    def clear(self):
+        self._length = 0
+
+
+def write_wav_file(pcm, channels, sample_width, rate, path=None):
+    """Write raw PCM to a WAV file (a new temp file if no path is given)"""
+    if path is None:
+        fd, path = tempfile.mkstemp(suffix=".wav")
+        os.close(fd)
+    with wave.open(path, 'wb') as wf:
+        wf.setnchannels(channels)
+        wf.setsampwidth(sample_width)
+        wf.setframerate(rate)
+        wf.writeframes(pcm)
+    return path
+
+
+def wav_duration(path):
+    """Length of a WAV file in seconds"""
+    with wave.open(path, 'rb') as wf:
+        return wf.getnframes() / wf.getframerate()
+
+
+def create_sink(mode, channels, sample_width, rate, directory=None, prefix=None):
+    """Create the capture sink for the configured capture mode (any file goes in directory)"""
+    if mode == 'memory':
+        return PcmBuffer(channels, sample_width, rate, directory=directory, prefix=prefix)
+    return WavFileSink(channels, sample_width, rate, directory=directory, prefix=prefix)
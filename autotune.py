@@ -0,0 +1,205 @@
+# autotune.py - Find the best local Whisper settings for this machine
+
+import os
+import sys
+import gc
+import json
+import time
+import glob
+import wave
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from audio_sink import write_wav_file
+from startup import module_available
+
+CONFIG_FILE = 'transcription_config.json'
+
+# Least to most accurate; the largest model that meets the target wins
+MODEL_SIZES = ('tiny', 'base', 'small', 'medium', 'large-v3')
+COMPUTE_TYPES = {
+    'cpu': ('int8', 'int8_float32', 'float32'),
+    'cuda': ('float16', 'int8_float16', 'int8'),
+}
+WORKER_COUNTS = (1, 2)
+BEAM_SIZES = (5, 1)  # Prefer the more accurate beam search while it meets the target
+
+
+def find_reference_clip(directory="transcriptions"):
+    """Most recent failed recording to calibrate on, if there is one"""
+    recordings = sorted(glob.glob(os.path.join(directory, "failed_recording_*.wav")))
+    return recordings[-1] if recordings else None
+
+
+def prepare_clip(path, max_seconds):
+    """Copy the first max_seconds of a WAV to a temp file; returns (path, seconds)"""
+    with wave.open(path, 'rb') as wf:
+        channels, sample_width, rate = wf.getnchannels(), wf.getsampwidth(), wf.getframerate()
+        frames = wf.readframes(int(max_seconds * rate))
+    seconds = len(frames) / (channels * sample_width * rate)
+    return write_wav_file(frames, channels, sample_width, rate), seconds
+
+
+def thread_candidates(cores):
+    """cpu_threads values worth trying (0 lets CTranslate2 decide)"""
+    return sorted({0, 1, 2, 4, max(1, cores // 2), cores})
+
+
+def measure(model_size, device, clip, clip_seconds, language, compute_type, cpu_threads, num_workers,
+            beam_size, repeats=1):
+    """Load a model with these settings and time num_workers concurrent transcriptions of the clip.
+
+    Returns (rtf, load_seconds), where rtf is wall time per second of audio
+    transcribed (lower is faster).
+    """
+    from faster_whisper import WhisperModel
+
+    start_time = time.perf_counter()
+    model = WhisperModel(model_size, device=device, compute_type=compute_type,
+                         cpu_threads=cpu_threads, num_workers=num_workers)
+    load_seconds = time.perf_counter() - start_time
+
+    def _run(_):
+        segments, info = model.transcribe(clip, language=language, beam_size=beam_size)
+        for _ in segments:  # Decoding happens while iterating
+            pass
+
+    best = None
+    try:
+        with ThreadPoolExecutor(max_workers=num_workers) as executor:
+            for _ in range(repeats):
+                start_time = time.perf_counter()
+                list(executor.map(_run, range(num_workers)))
+                elapsed = time.perf_counter() - start_time
+                best = elapsed if best is None else min(best, elapsed)
+    finally:
+        del model
+        gc.collect()
+    return best / (clip_seconds * num_workers), load_seconds
+
+
+def tune_model(model_size, args, clip, clip_seconds):
+    """Coordinate search over compute type, threads, workers and beam size for one model.
+
+    Returns (settings, rtf) for the fastest settings found, or (None, None)
+    if the model couldn't be loaded.
+    """
+    cores = os.cpu_count() or 1
+    stages = [
+        ('compute_type', COMPUTE_TYPES.get(args.device, COMPUTE_TYPES['cpu'])),
+        ('cpu_threads', thread_candidates(cores) if args.device == 'cpu' else (0,)),
+        ('num_workers', WORKER_COUNTS),
+    ]
+    best = {'compute_type': stages[0][1][0], 'cpu_threads': 0, 'num_workers': 1, 'beam_size': BEAM_SIZES[0]}
+    best_rtf = None
+    measured = {}
+
+    def trial(settings):
+        key = tuple(sorted(settings.items()))
+        if key not in measured:
+            try:
+                rtf, load_seconds = measure(model_size, args.device, clip, clip_seconds, args.language,
+                                            repeats=args.repeats, **settings)
+            except Exception as e:
+                print(f"  {model_size} {settings}: failed ({e})")
+                rtf = None
+            else:
+                print(f"  {model_size:<9}{settings['compute_type']:<14}{settings['cpu_threads']:>8}"
+                      f"{settings['num_workers']:>9}{settings['beam_size']:>6}{rtf:>9.3f}{load_seconds:>8.1f}s")
+            measured[key] = rtf
+        return measured[key]
+
+    for name, values in stages:
+        for value in values:
+            rtf = trial(dict(best, **{name: value}))
+            if rtf is not None and (best_rtf is None or rtf < best_rtf):
+                best, best_rtf = dict(best, **{name: value}), rtf
+        if best_rtf is None:
+            return None, None  # The model itself doesn't load
+
+    # Smaller beams are faster but less accurate; only drop the beam if needed
+    for beam_size in BEAM_SIZES[1:]:
+        if best_rtf <= args.target_rtf:
+            break
+        rtf = trial(dict(best, beam_size=beam_size))
+        if rtf is not None and rtf < best_rtf:
+            best, best_rtf = dict(best, beam_size=beam_size), rtf
+    return best, best_rtf
+
+
+def save_settings(model_size, settings, path=CONFIG_FILE):
+    """Write the chosen settings to the local_* keys of the config file"""
+    config = {}
+    if os.path.exists(path):
+        with open(path, 'r') as f:
+            config = json.load(f)
+    config.update({
+        'local_model': model_size,
+        'local_device': settings['device'],
+        'local_compute_type': settings['compute_type'],
+        'local_cpu_threads': settings['cpu_threads'],
+        'local_num_workers': settings['num_workers'],
+        'local_beam_size': settings['beam_size'],
+    })
+    with open(path, 'w') as f:
+        json.dump(config, f, indent=2)
+
+
+def autotune(args):
+    """Tune each model from least to most accurate and keep the largest that meets the target"""
+    source = args.clip or find_reference_clip()
+    if not source:
+        print("No reference clip. Pass --clip some_speech.wav (a minute of normal speech works well).")
+        return None
+    clip, clip_seconds = prepare_clip(source, args.max_seconds)
+    print(f"Calibrating on {clip_seconds:.0f}s of {source}, target RTF {args.target_rtf}\n")
+    print(f"  {'model':<9}{'compute':<14}{'threads':>8}{'workers':>9}{'beam':>6}{'RTF':>9}{'load':>9}")
+
+    chosen = None
+    try:
+        for model_size in args.models.split(","):
+            settings, rtf = tune_model(model_size.strip(), args, clip, clip_seconds)
+            if settings is None:
+                continue
+            print(f"  -> best for {model_size}: RTF {rtf:.3f}\n")
+            if rtf > args.target_rtf:
+                break  # Larger models will only be slower
+            chosen = (model_size.strip(), dict(settings, device=args.device), rtf)
+    finally:
+        os.unlink(clip)
+
+    if chosen is None:
+        print(f"No model met the target RTF of {args.target_rtf}. Config left unchanged.")
+        return None
+
+    model_size, settings, rtf = chosen
+    print(f"Chosen: {model_size} {settings['compute_type']}, cpu_threads={settings['cpu_threads']}, "
+          f"num_workers={settings['num_workers']}, beam_size={settings['beam_size']} "
+          f"(RTF {rtf:.3f}, {1 / rtf:.1f}x real time)")
+    if args.dry_run:
+        print("Dry run, config not written.")
+    else:
+        save_settings(model_size, settings)
+        print(f"Saved to {CONFIG_FILE}; the local fallback uses these settings from the next start.")
+    return chosen
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Find the best local faster-whisper settings for this machine")
+    parser.add_argument("--clip", help="Reference WAV (default: the latest failed recording)")
+    parser.add_argument("--max-seconds", type=float, default=60.0, help="Use at most this much of the clip")
+    parser.add_argument("--target-rtf", type=float, default=0.5,
+                        help="Required processing time per second of audio (0.5 = twice real time)")
+    parser.add_argument("--models", default=",".join(MODEL_SIZES[:4]), help="Comma-separated model sizes to try")
+    parser.add_argument("--device", default="cpu", help="cpu or cuda")
+    parser.add_argument("--language", default="en")
+    parser.add_argument("--repeats", type=int, default=1, help="Runs per candidate (the fastest counts)")
+    parser.add_argument("--dry-run", action="store_true", help="Print the result without writing the config")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if not module_available("faster_whisper"):
+        print("faster-whisper is not installed. Run: pip install -r requirements.txt")
+        sys.exit(1)
+    sys.exit(0 if autotune(args) else 1)
@@ -0,0 +1,270 @@
+import os
+import time
+import random
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from startup import module_available
+from audio_sink import WHISPER_RATE, as_audio
+
+logger = logging.getLogger("backends")
+
+# OpenAI Whisper API upload limit
+OPENAI_UPLOAD_LIMIT = 25 * 1024 * 1024
+
+# Audio shared by neighbouring shards of a long local transcription
+SHARD_OVERLAP_SECONDS = 1.0
+
+# One client per endpoint; its keep-alive pool is reused by every upload
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+class TranscriptionCancelled(Exception):
+    """Raised when a transcription is abandoned because another backend won"""
+
+
+def get_client(base_url=None, api_key=None):
+    """Return the shared OpenAI client for an endpoint, creating it on first use"""
+    key = (base_url, api_key)
+    with _clients_lock:
+        if key not in _clients:
+            from openai import OpenAI
+            # Retries are done by APIBackend so they can be bounded and jittered
+            _clients[key] = OpenAI(api_key=api_key, base_url=base_url, max_retries=0)
+        return _clients[key]
+
+
+def is_transient(error):
+    """Errors worth retrying: timeouts, dropped connections, rate limits and 5xx"""
+    import openai
+    if isinstance(error, (openai.APIConnectionError, openai.RateLimitError)):
+        return True
+    return isinstance(error, openai.APIStatusError) and error.status_code >= 500
+
+
+def backoff_delay(attempt, base_seconds, max_seconds=8.0):
+    """Exponential backoff with full jitter"""
+    return random.uniform(0, min(max_seconds, base_seconds * 2 ** attempt))
+
+
+class Backend:
+    """Turns audio into text; raises on failure"""
+
+    name = 'backend'
+    remote = False  # Remote backends are sent the encoded upload file; others get the PcmAudio
+    max_upload_bytes = None
+
+    def transcribe(self, audio_path, language, metrics, cancel=None, on_segment=None):
+        """cancel is an optional threading.Event; backends stop early once it is set.
+        Backends that produce timed segments pass each one to on_segment as a
+        dict with start, end and text.
+        """
+        raise NotImplementedError
+
+
+class APIBackend(Backend):
+    """OpenAI Whisper API, or any OpenAI-compatible server (e.g. a self-hosted
+    Whisper server on the LAN) when base_url is set"""
+
+    remote = True
+
+    def __init__(self, name='api', base_url=None, api_key=None, model='whisper-1', timeout=120.0,
+                 retries=2, backoff_seconds=0.5, max_upload_bytes=OPENAI_UPLOAD_LIMIT):
+        self.name = name
+        self.base_url = base_url
+        self.api_key = api_key
+        self.model = model
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff_seconds = backoff_seconds
+        self.max_upload_bytes = max_upload_bytes
+
+    @property
+    def client(self):
+        return get_client(self.base_url, self.api_key)
+
+    def transcribe(self, audio_path, language, metrics, cancel=None, on_segment=None, retries=None):
+        # A request in flight can't be interrupted, but no retries start after cancel
+        retries = self.retries if retries is None else retries
+        file_size = os.path.getsize(audio_path)
+        attempt = 0
+        while True:
+            try:
+                upload_start = time.perf_counter()
+                with open(audio_path, "rb") as audio_file:
+                    response = self.client.audio.transcriptions.with_raw_response.create(
+                        model=self.model,
+                        file=audio_file,
+                        language=language,
+                        timeout=self.timeout
+                    )
+                    transcript = response.parse()
+                break
+            except Exception as e:
+                if attempt >= retries or not is_transient(e):
+                    raise
+                delay = backoff_delay(attempt, self.backoff_seconds)
+                attempt += 1
+                metrics.add('api_retries', 1)
+                logger.warning(f"{self.name} request failed ({e}), retry {attempt}/{retries} in {delay:.2f}s")
+                if cancel is None:
+                    time.sleep(delay)
+                elif cancel.wait(delay):
+                    raise TranscriptionCancelled()
+        request_seconds = time.perf_counter() - upload_start
+
+        # Split request time into server processing and transfer when the header is present
+        processing_ms = response.headers.get('openai-processing-ms')
+        api_seconds = float(processing_ms) / 1000 if processing_ms else request_seconds
+        metrics.add_time('api_latency', api_seconds)
+        metrics.add_time('upload', max(0.0, request_seconds - api_seconds))
+        metrics.add('bytes_uploaded', file_size)
+        return transcript.text
+
+
+class LocalBackend(Backend):
+    """In-process faster-whisper, using the shared warm model.
+
+    The audio (a WAV path or PcmAudio) is handed to the model as a float32
+    array, so a recording held in memory never goes through a WAV file.
+    With num_workers > 1, recordings of at least twice shard_min_seconds are
+    cut at silence into num_workers shards (views of that array) that are
+    decoded concurrently by the model's workers (CTranslate2 releases the
+    GIL while decoding).
+    """
+
+    def __init__(self, model_manager, name='local', model='base', device='cpu', compute_type='default',
+                 cpu_threads=0, num_workers=1, beam_size=5, shard_min_seconds=60.0):
+        self.name = name
+        self.model_manager = model_manager
+        self.model = model
+        self.device = device
+        self.compute_type = compute_type
+        self.cpu_threads = cpu_threads
+        self.num_workers = num_workers
+        self.beam_size = beam_size
+        self.shard_min_seconds = shard_min_seconds
+
+    def _segments(self, model, samples, language, cancel, offset=0.0):
+        """Decode 16 kHz float32 samples into segment dicts, shifted by offset seconds"""
+        segments, info = model.transcribe(samples, language=language, beam_size=self.beam_size)
+        # Segments are decoded lazily, so stopping the loop stops inference
+        for segment in segments:
+            if cancel is not None and cancel.is_set():
+                raise TranscriptionCancelled()
+            yield {'start': round(segment.start + offset, 2), 'end': round(segment.end + offset, 2), 'text': segment.text}
+
+    def transcribe(self, audio_path, language, metrics, cancel=None, on_segment=None):
+        if not module_available('faster_whisper'):
+            raise RuntimeError("faster-whisper is not installed. Run: pip install -r requirements.txt")
+
+        # Reuse the warm model if one is loaded (downloads on first use)
+        with metrics.stage('model_load'):
+            model = self.model_manager.get_model(self.model, device=self.device, compute_type=self.compute_type,
+                                                 cpu_threads=self.cpu_threads, num_workers=self.num_workers)
+
+        with metrics.stage('inference'):
+            audio = as_audio(audio_path).to_mono(WHISPER_RATE)
+            samples = audio.samples()
+            duration = len(samples) / WHISPER_RATE
+            if self.num_workers > 1 and duration >= 2 * self.shard_min_seconds:
+                return self._transcribe_sharded(model, audio, samples, duration, language, metrics, cancel, on_segment)
+
+            texts = []
+            for segment in self._segments(model, samples, language, cancel):
+                texts.append(segment['text'])
+                if on_segment:
+                    on_segment(segment)
+            return " ".join(texts)
+
+    def _transcribe_sharded(self, model, audio, samples, duration, language, metrics, cancel, on_segment):
+        """Decode silence-cut shards concurrently and stitch them in order, dropping
+        words repeated across the overlap between shards"""
+        from chunking import plan_pcm_pieces, overlap_words, drop_leading_words
+
+        shard_seconds = max(self.shard_min_seconds, duration / self.num_workers) + SHARD_OVERLAP_SECONDS
+        pieces = plan_pcm_pieces(audio.pcm, 1, audio.sample_width, WHISPER_RATE, int(shard_seconds * WHISPER_RATE),
+                                 int(SHARD_OVERLAP_SECONDS * WHISPER_RATE))
+        shards = [(samples[start:end], start / WHISPER_RATE) for start, end in pieces]
+        metrics.set(local_shards=len(shards))
+        logger.info(f"Transcribing {duration:.0f}s locally in {len(shards)} shards")
+
+        abort = threading.Event()  # Stops the other shards if one fails
+
+        def _run(shard):
+            shard_samples, offset = shard
+            segments = []
+            for segment in self._segments(model, shard_samples, language, cancel, offset):
+                if abort.is_set():
+                    raise TranscriptionCancelled()
+                segments.append(segment)
+            return segments
+
+        executor = ThreadPoolExecutor(max_workers=self.num_workers, thread_name_prefix="shard")
+        try:
+            futures = [executor.submit(_run, shard) for shard in shards]
+            # Later shards keep decoding while earlier ones are emitted in order
+            texts, recent_words = [], []
+            for future in futures:
+                segments = future.result()
+                words = " ".join(segment['text'] for segment in segments).split()
+                for segment in drop_leading_words(segments, overlap_words(recent_words, words)):
+                    texts.append(segment['text'])
+                    recent_words = (recent_words + segment['text'].split())[-30:]
+                    if on_segment:
+                        on_segment(segment)
+            return " ".join(texts)
+        finally:
+            abort.set()
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+def create_backends(config, model_manager):
+    """Build the ordered backend list from config['backends'].
+
+    Entries are "api", "local", or dicts with a "type" of "api" or "local" and
+    their own settings, for example a Whisper server on the LAN:
+    {"type": "api", "name": "lan", "base_url": "http://whisper.lan:8000/v1", "model": "small"}
+    """
+    backends = []
+    for entry in config['backends']:
+        options = {'type': entry} if isinstance(entry, str) else dict(entry)
+        kind = options.get('type')
+        name = options.get('name', kind)
+
+        if kind == 'api':
+            base_url = options.get('base_url', config['api_base_url'])
+            api_key = os.getenv(options.get('api_key_env', 'OPENAI_API_KEY'))
+            if not api_key and base_url:
+                api_key = 'none'  # Self-hosted servers usually don't check the key
+            if 'max_upload_mb' in options:
+                max_upload_bytes = int(options['max_upload_mb'] * 1024 * 1024)
+            else:
+                max_upload_bytes = OPENAI_UPLOAD_LIMIT if base_url is None else None
+            backends.append(APIBackend(
+                name,
+                base_url=base_url,
+                api_key=api_key,
+                model=options.get('model', config['api_model']),
+                timeout=options.get('timeout_seconds', config['api_timeout_seconds']),
+                retries=options.get('retries', config['api_retries']),
+                backoff_seconds=options.get('retry_backoff_seconds', config['api_retry_backoff_seconds']),
+                max_upload_bytes=max_upload_bytes
+            ))
+        elif kind == 'local':
+            backends.append(LocalBackend(
+                model_manager,
+                name,
+                model=options.get('model', config['local_model']),
+                device=options.get('device', config['local_device']),
+                compute_type=options.get('compute_type', config['local_compute_type']),
+                cpu_threads=options.get('cpu_threads', config['local_cpu_threads']),
+                num_workers=options.get('num_workers', config['local_num_workers']),
+                beam_size=options.get('beam_size', config['local_beam_size']),
+                shard_min_seconds=options.get('shard_min_seconds', config['local_shard_min_seconds'])
+            ))
+        else:
+            logger.error(f"Unknown transcription backend {entry!r}, skipping it")
+    return backends
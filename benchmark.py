@@ -0,0 +1,473 @@
+# benchmark.py - Offline end-to-end benchmarks: fake mic, fake Whisper server, optional fake local model
+
+import os
+import sys
+import json
+import time
+import wave
+import types
+import random
+import shutil
+import argparse
+import tempfile
+import threading
+import subprocess
+import importlib.machinery
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks", "results")
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks", "baseline.json")
+
+# name -> (audio seconds, API failure rate)
+SCENARIOS = {
+    '1min': (60, 0.0),
+    '15min': (15 * 60, 0.0),
+    '60min': (60 * 60, 0.0),
+    'api-down': (60, 1.0),
+}
+
+# Metrics compared against the baseline (lower is better)
+COMPARED = ('stop_to_file_seconds', 'peak_rss_mb', 'cpu_seconds', 'bytes_uploaded')
+
+FILLER_WORDS = "so the plan for this week is to finish the draft and send it over for review".split()
+
+# Buffers the fake sound card holds for a reader that falls behind; older audio is lost as an overflow
+HOST_BUFFERS = 4
+PA_INPUT_OVERFLOW = 2
+
+
+def synthetic_speech(seconds, rate=16000, seed=0):
+    """Speech-like int16 PCM: noisy bursts of 2-5s separated by 0.3-1.5s pauses"""
+    import numpy as np
+    rng = np.random.default_rng(seed)
+    samples = np.empty(int(seconds * rate), dtype=np.int16)
+    pos = 0
+    while pos < len(samples):
+        talk = int(rng.uniform(2, 5) * rate)
+        pause = int(rng.uniform(0.3, 1.5) * rate)
+        end = min(len(samples), pos + talk)
+        envelope = 2000 + 1500 * np.sin(np.linspace(0, 6 * np.pi, end - pos))
+        samples[pos:end] = (rng.standard_normal(end - pos) * envelope).clip(-32768, 32767)
+        pos = end
+        end = min(len(samples), pos + pause)
+        samples[pos:end] = (rng.standard_normal(end - pos) * 20).astype(np.int16)
+        pos = end
+    return samples.tobytes()
+
+
+def read_wav_pcm(path):
+    with wave.open(path, 'rb') as wf:
+        return wf.readframes(wf.getnframes()), wf.getframerate(), wf.getnchannels()
+
+
+class FakeStream:
+    """Replays PCM like a PyAudio input stream, paced at `speed` times real time.
+
+    With a stream_callback it is called from the stream's own thread, as
+    PortAudio does. Like a sound card, the stream only holds HOST_BUFFERS
+    buffers for a reader that falls behind; anything older is skipped and
+    flagged as an overflow.
+    """
+
+    def __init__(self, pcm, rate, channels, speed=1.0, frames_per_buffer=1024, stream_callback=None, start=True):
+        self.pcm = pcm
+        self.rate = rate
+        self.frame_bytes = 2 * channels
+        self.speed = speed
+        self.frames_per_buffer = frames_per_buffer
+        self.callback = stream_callback
+        self.pos = 0
+        self.frames_read = 0
+        self.overflows = 0
+        self.active = False
+        self.thread = None
+        if start:
+            self.start_stream()
+
+    def _next(self, num_frames):
+        """The next num_frames of audio once they are due, and whether older audio was lost"""
+        due = self.start_time + (self.frames_read + num_frames) / self.rate / self.speed
+        now = time.perf_counter()
+        if due > now:
+            time.sleep(due - now)
+        overflowed = False
+        behind = int((now - due) * self.rate * self.speed) // num_frames
+        if behind > HOST_BUFFERS:
+            skipped = (behind - HOST_BUFFERS) * num_frames
+            self.frames_read += skipped
+            self.pos = (self.pos + skipped * self.frame_bytes) % len(self.pcm)
+            self.overflows += 1
+            overflowed = True
+
+        size = num_frames * self.frame_bytes
+        chunk = self.pcm[self.pos:self.pos + size]
+        while len(chunk) < size:  # Loop the source
+            chunk += self.pcm[:size - len(chunk)]
+        self.pos = (self.pos + size) % len(self.pcm)
+        self.frames_read += num_frames
+        return chunk, overflowed
+
+    def read(self, num_frames, exception_on_overflow=True):
+        return self._next(num_frames)[0]
+
+    def _pump(self):
+        while self.active:
+            chunk, overflowed = self._next(self.frames_per_buffer)
+            if self.active:
+                self.callback(chunk, self.frames_per_buffer, {}, PA_INPUT_OVERFLOW if overflowed else 0)
+
+    def start_stream(self):
+        self.start_time = time.perf_counter()
+        self.frames_read = 0
+        self.active = True
+        if self.callback:
+            self.thread = threading.Thread(target=self._pump, daemon=True)
+            self.thread.start()
+
+    def is_active(self):
+        return self.active
+
+    def stop_stream(self):
+        self.active = False
+        if self.thread and self.thread is not threading.current_thread():
+            self.thread.join()
+
+    def close(self):
+        self.stop_stream()
+
+
+def gil_hog(hold_ms, stop):
+    """Keep taking the GIL for about hold_ms at a time, like a long pure-C call would"""
+    n = 100000
+    start = time.perf_counter()
+    sum(range(n))
+    n = max(1000, int(n * hold_ms / 1000 / max(time.perf_counter() - start, 1e-6)))
+    while not stop.is_set():
+        sum(range(n))  # One C call; no other thread runs until it returns
+        time.sleep(0.001)
+
+
+def fake_pyaudio_module(pcm, rate, channels, speed):
+    """A stand-in `pyaudio` module whose streams replay pcm"""
+    module = types.ModuleType("pyaudio")
+    module.paInt16 = 8
+    module.paContinue = 0
+    module.paInputOverflow = PA_INPUT_OVERFLOW
+    module.get_sample_size = lambda fmt: 2
+
+    class PyAudio:
+        def open(self, frames_per_buffer=1024, stream_callback=None, start=True, **kwargs):
+            return FakeStream(pcm, rate, channels, speed, frames_per_buffer, stream_callback, start)
+
+        def get_sample_size(self, fmt):
+            return 2
+
+        def get_default_input_device_info(self):
+            return {'defaultSampleRate': float(rate), 'maxInputChannels': channels}
+
+        def get_device_info_by_index(self, index):
+            return self.get_default_input_device_info()
+
+        def terminate(self):
+            pass
+
+    module.PyAudio = PyAudio
+    return module
+
+
+FAKE_PYAUDIO_SHIM = """# Written by benchmark.py: a fake pyaudio that a spawned capture process can import too
+import sys
+sys.path.insert(0, {bench_dir!r})
+from benchmark import fake_pyaudio_module, read_wav_pcm
+_pcm, _rate, _channels = read_wav_pcm({wav!r})
+globals().update((k, v) for k, v in vars(fake_pyaudio_module(_pcm, _rate, _channels, {speed!r})).items()
+                 if not k.startswith('__'))
+"""
+
+
+def install_fake_pyaudio(pcm, rate, channels, speed, directory):
+    """Put a `pyaudio.py` replaying pcm first on sys.path.
+
+    A module in sys.modules would do for this process, but a capture process
+    started with spawn imports its modules afresh; it inherits sys.path.
+    """
+    wav = os.path.join(directory, "fake_mic.wav")
+    with wave.open(wav, 'wb') as wf:
+        wf.setnchannels(channels)
+        wf.setsampwidth(2)
+        wf.setframerate(rate)
+        wf.writeframes(pcm)
+    with open(os.path.join(directory, "pyaudio.py"), 'w') as f:
+        f.write(FAKE_PYAUDIO_SHIM.format(bench_dir=os.path.dirname(os.path.abspath(__file__)), wav=wav,
+                                         speed=speed))
+    sys.path.insert(0, directory)
+    sys.modules.pop('pyaudio', None)
+
+
+class FakeWhisperServer:
+    """Local stand-in for the OpenAI transcription endpoint.
+
+    Latency is base_latency plus rtf times the audio length (estimated from
+    16 kHz mono WAV bytes). A fraction failure_rate of requests get a 500.
+    """
+
+    def __init__(self, base_latency=0.5, rtf=0.02, failure_rate=0.0, seed=0):
+        self.base_latency = base_latency
+        self.rtf = rtf
+        self.failure_rate = failure_rate
+        self.bytes_received = 0
+        self.requests = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self._server.server_address[1]}/v1"
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                remaining = length
+                while remaining > 0:
+                    remaining -= len(self.rfile.read(min(remaining, 1 << 20)))
+                with server._lock:
+                    server.bytes_received += length
+                    server.requests += 1
+                    fail = server._random.random() < server.failure_rate
+
+                audio_seconds = length / 32000
+                latency = server.base_latency + server.rtf * audio_seconds
+                time.sleep(latency)
+                if fail:
+                    body = json.dumps({'error': {'message': 'simulated outage', 'type': 'server_error'}}).encode()
+                    self.send_response(500)
+                else:
+                    words = int(audio_seconds * 2.5) or 1
+                    text = " ".join(FILLER_WORDS[i % len(FILLER_WORDS)] for i in range(words))
+                    body = json.dumps({'text': text}).encode()
+                    self.send_response(200)
+                    self.send_header('openai-processing-ms', str(int(latency * 1000)))
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        return Handler
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class FakeWhisperModel:
+    """Stand-in for faster_whisper.WhisperModel that sleeps rtf x audio length"""
+
+    load_seconds = 1.0
+    rtf = 0.1
+
+    def __init__(self, model_size_or_path, device="cpu", compute_type="default", **kwargs):
+        time.sleep(self.load_seconds)
+
+    def transcribe(self, audio, language=None, **kwargs):
+        if isinstance(audio, str):
+            with wave.open(audio, 'rb') as wf:
+                duration = wf.getnframes() / wf.getframerate()
+        else:
+            duration = len(audio) / 16000
+        info = types.SimpleNamespace(duration=duration, language=language or "en")
+
+        def segments():
+            start = 0.0
+            while start < duration:
+                end = min(duration, start + 10.0)
+                time.sleep((end - start) * self.rtf)
+                words = int((end - start) * 2.5) or 1
+                text = " " + " ".join(FILLER_WORDS[i % len(FILLER_WORDS)] for i in range(words))
+                yield types.SimpleNamespace(start=start, end=end, text=text)
+                start = end
+
+        return segments(), info
+
+
+def install_fake_whisper():
+    """Make `faster_whisper` resolve to the fake model"""
+    module = types.ModuleType("faster_whisper")
+    module.WhisperModel = FakeWhisperModel
+    module.__spec__ = importlib.machinery.ModuleSpec("faster_whisper", None)
+    sys.modules["faster_whisper"] = module
+
+
+def run_scenario(name, args):
+    """Run one scripted session in this process and return its measurements"""
+    import numpy as np  # noqa: F401  (imported before timing starts)
+
+    audio_seconds, failure_rate = SCENARIOS[name]
+    if args.wav:
+        pcm, rate, channels = read_wav_pcm(args.wav)
+    else:
+        rate, channels = 16000, 1
+        pcm = synthetic_speech(min(audio_seconds, 300), rate)
+
+    server = FakeWhisperServer(args.api_latency, args.api_rtf, failure_rate).start()
+    workdir = tempfile.mkdtemp(prefix=f"bench_{name}_")
+    os.chdir(workdir)
+    # The fake server stands in for the OpenAI API, with the same upload limit
+    config = {'output_dir': 'out', 'auto_open': False,
+              'background_jobs': True, 'preload_local_model': False,
+              'backends': [{'type': 'api', 'base_url': server.base_url, 'max_upload_mb': 25}, 'local']}
+    config.update(json.loads(args.config) if args.config else {})
+    with open('transcription_config.json', 'w') as f:
+        json.dump(config, f)
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    install_fake_pyaudio(pcm, rate, channels, args.speed, workdir)
+    if args.fake_local:
+        install_fake_whisper()
+
+    import transcription
+    from startup import module_available
+
+    module_available.cache_clear()
+    tool = transcription.TranscriptionTool()
+    if tool.job_queue is not None:
+        tool.job_queue.start()
+    if tool.config['armed_capture'] and tool.arm_capture():
+        time.sleep(tool.config['preroll_seconds'] / args.speed)  # Let the pre-roll fill
+
+    # Optionally keep the GIL busy while recording, as heavy Python work would
+    stop_hog = threading.Event()
+    if args.gil_load:
+        threading.Thread(target=gil_hog, args=(args.gil_load, stop_hog), daemon=True).start()
+
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    tool.start_recording()
+    time.sleep(audio_seconds / args.speed)
+    tool.stop_recording()  # Without background jobs this transcribes before returning
+    stop_hog.set()
+    while tool.job_queue is not None and tool.job_queue.depth():
+        time.sleep(0.05)
+    wall_seconds = time.perf_counter() - wall_start
+    cpu_seconds = time.process_time() - cpu_start
+    tool.cleanup()  # Also releases an armed mic (and a capture process's shared memory)
+    server.stop()
+
+    from metrics import load_records
+    records = load_records(os.path.join('out', 'metrics.jsonl'))
+    record = records[-1] if records else {}
+    result = {
+        'scenario': name,
+        'audio_seconds': audio_seconds,
+        'status': record.get('status'),
+        'backend': record.get('backend'),
+        'stop_to_file_seconds': record.get('stop_to_file_seconds'),
+        'hotkey_to_first_sample_seconds': record.get('hotkey_to_first_sample_seconds'),
+        'preroll_seconds': record.get('preroll_seconds'),
+        'overflow_count': record.get('overflow_count'),
+        'dropped_frames': record.get('dropped_frames'),
+        'capture_backlog_peak': record.get('capture_backlog_peak'),
+        'stages': record.get('stages', {}),
+        'bytes_uploaded': server.bytes_received,
+        'api_requests': server.requests,
+        'peak_rss_mb': record.get('process_peak_rss_mb'),  # Each scenario has a fresh process
+        'cpu_seconds': round(cpu_seconds, 3),
+        'wall_seconds': round(wall_seconds, 3),
+    }
+    os.chdir("/")
+    shutil.rmtree(workdir, ignore_errors=True)
+    return result
+
+
+def compare(results, baseline):
+    """Print each compared metric next to the baseline"""
+    by_name = {r['scenario']: r for r in baseline.get('results', [])}
+    print(f"\n{'scenario':<10}{'metric':<24}{'current':>14}{'baseline':>14}{'change':>10}")
+    print("-" * 72)
+    for result in results:
+        base = by_name.get(result['scenario'])
+        if not base:
+            continue
+        for metric in COMPARED:
+            current, previous = result.get(metric), base.get(metric)
+            if current is None or previous is None:
+                continue
+            change = f"{(current - previous) / previous * 100:+.1f}%" if previous else "n/a"
+            print(f"{result['scenario']:<10}{metric:<24}{current:>14.3f}{previous:>14.3f}{change:>10}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Offline end-to-end benchmark of the transcription pipeline")
+    parser.add_argument("scenarios", nargs="*", default=list(SCENARIOS), help=f"Any of: {', '.join(SCENARIOS)}")
+    parser.add_argument("--speed", type=float, default=60.0, help="Replay speed relative to real time")
+    parser.add_argument("--wav", help="Replay this 16-bit WAV instead of synthetic speech")
+    parser.add_argument("--api-latency", type=float, default=0.5, help="Fake API base latency (s)")
+    parser.add_argument("--api-rtf", type=float, default=0.02, help="Fake API seconds per audio second")
+    parser.add_argument("--fake-local", action="store_true", help="Stub WhisperModel instead of loading faster-whisper")
+    parser.add_argument("--gil-load", type=float, default=0.0,
+                        help="Hold the GIL for this many ms at a time while recording (0 = off)")
+    parser.add_argument("--config", help="JSON of transcription_config overrides, e.g. '{\"upload_codec\": \"flac\"}'")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="Baseline results to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run as the new baseline")
+    parser.add_argument("--run-one", help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    if args.run_one:
+        # Child process: one scenario, JSON result on the last stdout line
+        result = run_scenario(args.run_one, args)
+        print("\n" + json.dumps(result))  # On a line of its own even after a prompt
+        sys.exit(0)
+
+    # Each scenario runs in a fresh interpreter so peak memory and CPU are its own
+    passthrough = [arg for arg in sys.argv[1:] if arg not in args.scenarios and arg != "--save-baseline"]
+    results = []
+    for name in args.scenarios:
+        if name not in SCENARIOS:
+            print(f"Unknown scenario: {name}")
+            sys.exit(1)
+        print(f"Running {name}...", flush=True)
+        # Answers "no" when a foreground run (background_jobs off) asks to open the transcript
+        proc = subprocess.run([sys.executable, os.path.abspath(__file__), "--run-one", name] + passthrough,
+                              input="n\n", capture_output=True, text=True)
+        if proc.returncode != 0 or not proc.stdout.strip():
+            print(f"  failed:\n{proc.stderr[-2000:]}")
+            continue
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        results.append(result)
+        # Peak RSS is None where neither psutil nor the resource module is available
+        peak_rss = "n/a" if result['peak_rss_mb'] is None else f"{result['peak_rss_mb']:.0f}MB"
+        print(f"  {result['status']} via {result['backend']}: stop-to-file {result['stop_to_file_seconds']}s, "
+              f"peak RSS {peak_rss}, CPU {result['cpu_seconds']}s, "
+              f"uploaded {result['bytes_uploaded'] / 1024 / 1024:.1f}MB, "
+              f"capture overflows {result['overflow_count']} (backlog peak {result['capture_backlog_peak']})")
+
+    run = {'timestamp': datetime.now().isoformat(timespec='seconds'), 'args': vars(args), 'results': results}
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    results_file = os.path.join(RESULTS_DIR, f"bench_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(results_file, 'w') as f:
+        json.dump(run, f, indent=2)
+    print(f"\nResults saved to {results_file}")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(run, f, indent=2)
+        print(f"Baseline updated: {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            compare(results, json.load(f))
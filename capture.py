@@ -0,0 +1,400 @@
+import time
+import logging
+import threading
+from collections import deque
+
+logger = logging.getLogger("capture")
+
+
+class CaptureEngine:
+    """Reads the mic in PyAudio's callback mode and hands the audio to on_audio.
+
+    PortAudio calls the callback on its own thread for every buffer. The
+    callback only appends the buffer to a deque (append and popleft need no
+    lock) and counts buffers the driver flagged as overflowed. A consumer
+    thread drains everything that has queued up, converts it as one batch and
+    passes it to on_audio. When inference or uploads keep the GIL busy, the
+    consumer falls behind and catches up later instead of the driver dropping
+    audio. Overflows still happen if the callback itself can't run in time;
+    they are counted, not hidden.
+    """
+
+    def __init__(self, pyaudio_instance, on_audio, format, rate, channels, chunk, device_index=None,
+                 converter=None):
+        import pyaudio
+
+        self.on_audio = on_audio
+        self.converter = converter
+        self.chunk_seconds = chunk / rate
+        self.overflows = 0  # Buffers PortAudio flagged as overflowed (audio lost before we got it)
+        self.buffers = 0  # Buffers received from the driver
+        self.backlog_peak = 0  # Most buffers drained in one batch
+        self.error = None
+        self._flags = (pyaudio.paInputOverflow, pyaudio.paContinue)
+        self._queue = deque()
+        self._delivered = 0
+        self._ready = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+        self.stream = pyaudio_instance.open(
+            format=format,
+            channels=channels,
+            rate=rate,
+            input=True,
+            input_device_index=device_index,
+            frames_per_buffer=chunk,
+            stream_callback=self._callback,
+            start=False
+        )
+
+    @property
+    def alive(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def _callback(self, in_data, frame_count, time_info, status_flags):
+        """PortAudio thread: queue the buffer and return at once"""
+        overflow, proceed = self._flags
+        self._queue.append(in_data)
+        self.buffers += 1
+        if status_flags & overflow:
+            self.overflows += 1
+        self._ready.set()
+        return None, proceed
+
+    def start(self):
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="capture")
+        self._thread.daemon = True
+        self._thread.start()
+        self.stream.start_stream()
+
+    def _drain(self):
+        """Pop every buffer queued so far"""
+        chunks = []
+        while True:
+            try:
+                chunks.append(self._queue.popleft())
+            except IndexError:
+                break
+        self.backlog_peak = max(self.backlog_peak, len(chunks))
+        return chunks
+
+    def _deliver(self, data):
+        if self.converter:
+            data = self.converter.process(data)
+        if data:
+            self.on_audio(data)
+
+    def _run(self):
+        """Consumer thread: convert and deliver queued audio in batches"""
+        try:
+            while True:
+                woke = self._ready.wait(0.5)
+                self._ready.clear()
+                stopping = self._stopping.is_set()
+                chunks = self._drain()
+                if chunks:
+                    self._deliver(b''.join(chunks))
+                    self._delivered += len(chunks)
+                if stopping:
+                    break
+                if not woke and not self.stream.is_active():
+                    raise IOError("the audio stream stopped delivering audio")
+
+            # The last few milliseconds held back by the resampling filter
+            if self.converter:
+                tail = self.converter.flush()
+                if tail:
+                    self.on_audio(tail)
+        except Exception as e:
+            self.error = e
+            logger.error(f"Capture stopped: {e}")
+            print(f"Capture stopped: {e}")
+            try:
+                self.stream.stop_stream()
+            except Exception:
+                pass
+
+    def catch_up(self, timeout=1.0):
+        """Wait until the audio received so far has been delivered"""
+        target = self.buffers
+        deadline = time.perf_counter() + timeout
+        while self._delivered < target and self.alive and time.perf_counter() < deadline:
+            time.sleep(min(0.005, self.chunk_seconds))
+
+    def reset_stats(self):
+        self.overflows = 0
+        self.backlog_peak = 0
+
+    def stop(self):
+        """Stop the stream, then deliver what is still queued (and the converter's tail)"""
+        try:
+            self.stream.stop_stream()
+        finally:
+            self._stopping.set()
+            self._ready.set()
+            if self._thread is not None:
+                self._thread.join(timeout=2.0)
+
+    def close(self):
+        try:
+            self.stop()
+        finally:
+            self.stream.close()
+
+
+# Header of the shared ring: uint64 counters written by the capture process
+WRITTEN, OVERFLOWS, RECEIVED, DELIVERED, PEAK = range(5)
+HEADER_BYTES = 8 * 5
+
+
+class SharedPcmRing:
+    """Single-writer ring of PCM in multiprocessing shared memory.
+
+    The segment starts with a header of counters; WRITTEN counts every byte
+    ever written, so a reader keeping its own count knows how much is new
+    and whether the writer has lapped it. views() hands out memoryviews of
+    the segment itself, so reading copies nothing.
+    """
+
+    def __init__(self, shm):
+        import numpy as np
+
+        self.shm = shm
+        self.name = shm.name
+        self.header = np.ndarray((5,), dtype=np.uint64, buffer=shm.buf)
+        self.data = shm.buf[HEADER_BYTES:]
+        self.size = len(self.data)
+
+    @classmethod
+    def create(cls, size):
+        from multiprocessing import shared_memory
+        ring = cls(shared_memory.SharedMemory(create=True, size=HEADER_BYTES + size))
+        ring.header[:] = 0
+        return ring
+
+    @classmethod
+    def attach(cls, name):
+        from multiprocessing import shared_memory
+        return cls(shared_memory.SharedMemory(name=name))
+
+    def write(self, data):
+        """Append PCM (writer only); the counter moves after the bytes are in place"""
+        data = memoryview(data).cast('B')
+        written = int(self.header[WRITTEN])
+        total = len(data)
+        data = data[-self.size:]  # Only the newest size bytes can survive
+        start = (written + total - len(data)) % self.size
+        first = min(len(data), self.size - start)
+        self.data[start:start + first] = data[:first]
+        self.data[:len(data) - first] = data[first:]
+        self.header[WRITTEN] = written + total
+
+    def views(self, position, count):
+        """The bytes [position, position + count) of the stream, as one or two views"""
+        start = position % self.size
+        first = min(count, self.size - start)
+        views = [self.data[start:start + first]]
+        if count > first:
+            views.append(self.data[:count - first])
+        return views
+
+    def close(self):
+        self.data.release()
+        del self.header
+        try:
+            self.shm.close()
+        except BufferError:
+            pass  # A view is still referenced somewhere; the segment goes when it is released
+
+    def unlink(self):
+        self.shm.unlink()
+
+
+def capture_process(ring_name, conn, stop, format, rate, channels, chunk, device_index, out_rate):
+    """Capture process: run a CaptureEngine whose output goes into the shared ring"""
+    ring = SharedPcmRing.attach(ring_name)
+    pa = engine = None
+
+    def mirror():
+        ring.header[RECEIVED] = engine.buffers
+        ring.header[DELIVERED] = engine._delivered
+        ring.header[OVERFLOWS] = engine.overflows
+        ring.header[PEAK] = max(int(ring.header[PEAK]), engine.backlog_peak)
+        engine.backlog_peak = 0
+
+    try:
+        import pyaudio
+        converter = None
+        if out_rate:
+            from resample import StreamingResampler
+            converter = StreamingResampler(rate, channels, out_rate)
+        pa = pyaudio.PyAudio()
+        engine = CaptureEngine(pa, ring.write, format, rate, channels, chunk, device_index, converter)
+        engine.start()
+        conn.send(('ready', None))
+        while not stop.wait(0.01):
+            mirror()
+            if not engine.alive:
+                raise engine.error or IOError("capture stopped")
+        engine.stop()  # Delivers what is still queued, and the converter's tail
+        mirror()
+    except Exception as e:
+        logger.error(f"Capture process failed: {e}")
+        try:
+            conn.send(('error', str(e)))
+        except Exception:
+            pass
+    finally:
+        if engine is not None:
+            try:
+                engine.stream.close()
+            except Exception:
+                pass
+        if pa is not None:
+            pa.terminate()
+        ring.close()
+        conn.close()
+
+
+class ProcessCaptureEngine:
+    """CaptureEngine in a separate process, handing audio over through shared memory.
+
+    The child process owns the PyAudio stream and the resampler and writes
+    converted audio into a SharedPcmRing, so capture never waits on this
+    interpreter's GIL. A reader thread here passes views of the ring straight
+    to on_audio. A reader that falls more than the whole ring behind loses the
+    oldest audio; that counts as an overflow. Same interface as CaptureEngine.
+    """
+
+    def __init__(self, on_audio, format, rate, channels, chunk, device_index=None, out_rate=None,
+                 ring_bytes=1 << 20, frame_bytes=2):
+        import multiprocessing
+
+        self.on_audio = on_audio
+        self.chunk_seconds = chunk / rate
+        self.error = None
+        self.ring = SharedPcmRing.create(ring_bytes - ring_bytes % frame_bytes)
+        context = multiprocessing.get_context('spawn')  # A fresh interpreter, without our PortAudio state
+        self._conn, child_conn = context.Pipe(duplex=False)
+        self._stop = context.Event()
+        self.process = context.Process(
+            target=capture_process,
+            args=(self.ring.name, child_conn, self._stop, format, rate, channels, chunk, device_index, out_rate),
+            name="capture",
+            daemon=True
+        )
+        self._child_conn = child_conn
+        self._read = 0  # Bytes of the stream passed on so far
+        self._lapped = 0  # Times the reader fell a whole ring behind
+        self._overflow_base = 0
+        self._final_stats = None  # (overflows, backlog_peak) once closed
+        self._stopping = threading.Event()
+        self._thread = None
+
+    @property
+    def alive(self):
+        return self.process.is_alive() and self._thread is not None and self._thread.is_alive()
+
+    @property
+    def overflows(self):
+        if self._final_stats:
+            return self._final_stats[0]
+        return int(self.ring.header[OVERFLOWS]) + self._lapped - self._overflow_base
+
+    @property
+    def backlog_peak(self):
+        if self._final_stats:
+            return self._final_stats[1]
+        return int(self.ring.header[PEAK])
+
+    def reset_stats(self):
+        self._overflow_base = int(self.ring.header[OVERFLOWS]) + self._lapped
+        self.ring.header[PEAK] = 0
+
+    def start(self, timeout=10.0):
+        """Start the capture process; raises if it can't open the mic"""
+        self.process.start()
+        self._child_conn.close()
+        try:
+            if not self._conn.poll(timeout):
+                raise IOError("the capture process did not start")
+            kind, message = self._conn.recv()
+        except EOFError:
+            kind, message = 'error', "the capture process exited"
+        if kind == 'error':
+            self.process.join(timeout=1.0)
+            raise IOError(message)
+        self._thread = threading.Thread(target=self._run, name="capture-reader")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _read_available(self):
+        """Pass on everything written since the last call, as views of the ring"""
+        written = int(self.ring.header[WRITTEN])
+        available = written - self._read
+        if available > self.ring.size:
+            # Lapped: the oldest unread audio has been overwritten
+            self._lapped += 1
+            self._read = written - self.ring.size
+            available = self.ring.size
+        if not available:
+            return
+        for view in self.ring.views(self._read, available):
+            self.on_audio(view)
+            try:
+                view.release()
+            except BufferError:
+                pass
+        self._read += available
+        # The writer may have overwritten part of what was passed on while we read it
+        if int(self.ring.header[WRITTEN]) - (self._read - available) > self.ring.size:
+            self._lapped += 1
+
+    def _run(self):
+        """Reader thread: poll the ring until the capture process is stopped or dies"""
+        try:
+            while True:
+                finished = self._stopping.is_set() or not self.process.is_alive()
+                self._read_available()
+                if finished:
+                    break
+                time.sleep(min(0.01, self.chunk_seconds))
+            if not self._stopping.is_set():
+                raise IOError("the capture process exited")
+        except Exception as e:
+            self.error = e
+            logger.error(f"Capture stopped: {e}")
+            print(f"Capture stopped: {e}")
+
+    def catch_up(self, timeout=1.0):
+        """Wait until the audio captured so far has been passed on"""
+        deadline = time.perf_counter() + timeout
+        target = int(self.ring.header[RECEIVED])
+        while int(self.ring.header[DELIVERED]) < target and self.alive and time.perf_counter() < deadline:
+            time.sleep(0.002)
+        written = int(self.ring.header[WRITTEN])
+        while self._read < written and self.alive and time.perf_counter() < deadline:
+            time.sleep(0.002)
+
+    def stop(self):
+        """Stop the capture process, then pass on what it wrote last"""
+        self._stop.set()
+        if self.process.pid is None:
+            self._child_conn.close()  # Never started
+        else:
+            self.process.join(timeout=5.0)
+            if self.process.is_alive():
+                self.process.terminate()
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+
+    def close(self):
+        try:
+            self.stop()
+        finally:
+            self._final_stats = (self.overflows, self.backlog_peak)
+            self._conn.close()
+            self.ring.close()
+            self.ring.unlink()
@@ -0,0 +1,171 @@
+import os
+import re
+import wave
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from audio_sink import write_wav_file
+
+logger = logging.getLogger("chunking")
+
+SAMPLE_DTYPES = {2: np.int16, 4: np.int32}
+
+
+def frame_energy(pcm, channels, sample_width, frame_len):
+    """Mean absolute amplitude of each frame_len-sample frame (vectorized)"""
+    samples = np.frombuffer(pcm, dtype=SAMPLE_DTYPES[sample_width])
+    if channels > 1:
+        samples = samples[:len(samples) - len(samples) % channels].reshape(-1, channels)
+        samples = np.abs(samples.astype(np.int64)).mean(axis=1)
+    else:
+        samples = np.abs(samples.astype(np.int64))
+    n_frames = len(samples) // frame_len
+    if n_frames == 0:
+        return np.zeros(0)
+    return samples[:n_frames * frame_len].reshape(n_frames, frame_len).mean(axis=1)
+
+
+def plan_pieces(wav_path, max_frames, overlap_frames=0, search_seconds=10.0, frame_ms=30):
+    """Plan (start, end) frame ranges of at most max_frames each.
+
+    Each cut is placed at the quietest frame in the last search_seconds before
+    the size limit, so pieces end at silence instead of mid-word. Consecutive
+    pieces share overlap_frames of audio so no words are lost at the seams.
+    Only the search windows are read from disk.
+    """
+    with wave.open(wav_path, 'rb') as wf:
+        def read(start, count):
+            wf.setpos(start)
+            return wf.readframes(count)
+
+        return _plan_cuts(read, wf.getnframes(), wf.getnchannels(), wf.getsampwidth(), wf.getframerate(),
+                          max_frames, overlap_frames, search_seconds, frame_ms)
+
+
+def plan_pcm_pieces(pcm, channels, sample_width, rate, max_frames, overlap_frames=0, search_seconds=10.0,
+                    frame_ms=30):
+    """plan_pieces for PCM already in memory (the search windows are views, not copies)"""
+    frame_bytes = channels * sample_width
+    view = memoryview(pcm).cast('B')
+
+    def read(start, count):
+        return view[start * frame_bytes:(start + count) * frame_bytes]
+
+    return _plan_cuts(read, len(view) // frame_bytes, channels, sample_width, rate,
+                      max_frames, overlap_frames, search_seconds, frame_ms)
+
+
+def _plan_cuts(read, total, channels, sample_width, rate, max_frames, overlap_frames, search_seconds, frame_ms):
+    """Shared by plan_pieces and plan_pcm_pieces; read(start, count) returns PCM frames"""
+    frame_len = max(1, int(rate * frame_ms / 1000))
+    search_frames = min(int(search_seconds * rate), max_frames // 2)
+    pieces = []
+    boundary = 0
+    while boundary < total:
+        start = max(0, boundary - overlap_frames)
+        limit = start + max_frames
+        if limit >= total:
+            pieces.append((start, total))
+            break
+
+        window_start = max(boundary + 1, limit - search_frames)
+        energy = frame_energy(read(window_start, limit - window_start), channels, sample_width, frame_len)
+        if len(energy):
+            cut = window_start + int(np.argmin(energy)) * frame_len + frame_len // 2
+        else:
+            cut = limit
+        pieces.append((start, cut))
+        boundary = cut
+    return pieces
+
+
+def split_wav(wav_path, max_bytes, overlap_seconds=1.0, search_seconds=10.0):
+    """Split a WAV file at silence into temp WAV files no larger than max_bytes"""
+    with wave.open(wav_path, 'rb') as wf:
+        channels = wf.getnchannels()
+        sample_width = wf.getsampwidth()
+        rate = wf.getframerate()
+
+    header_bytes = 44
+    max_frames = (max_bytes - header_bytes) // (channels * sample_width)
+    overlap_frames = int(overlap_seconds * rate)
+    pieces = plan_pieces(wav_path, max_frames, overlap_frames, search_seconds)
+
+    paths = [path for path, _ in _write_pieces(wav_path, pieces)]
+    logger.info(f"Split {os.path.basename(wav_path)} into {len(paths)} pieces")
+    return paths
+
+
+def _write_pieces(wav_path, pieces):
+    """Write each (start, end) frame range to a temp WAV; returns [(path, start)]"""
+    written = []
+    with wave.open(wav_path, 'rb') as wf:
+        channels, sample_width, rate = wf.getnchannels(), wf.getsampwidth(), wf.getframerate()
+        for start, end in pieces:
+            wf.setpos(start)
+            written.append((write_wav_file(wf.readframes(end - start), channels, sample_width, rate), start))
+    return written
+
+
+def _normalize(word):
+    return re.sub(r"[^\w']", "", word.lower())
+
+
+def overlap_words(previous, words, max_overlap_words=30, min_overlap_words=2):
+    """How many leading words repeat the end of previous (both lists of words)"""
+    tail = [_normalize(w) for w in previous[-max_overlap_words:]]
+    head = [_normalize(w) for w in words[:max_overlap_words]]
+    for k in range(min(len(tail), len(head)), min_overlap_words - 1, -1):
+        if tail[-k:] == head[:k]:
+            return k
+    return 0
+
+
+def merge_transcripts(texts, max_overlap_words=30, min_overlap_words=2):
+    """Join piece transcripts in order, dropping words repeated across a seam"""
+    merged = []
+    for text in texts:
+        words = (text or "").split()
+        if not words:
+            continue
+        merged.extend(words[overlap_words(merged, words, max_overlap_words, min_overlap_words):])
+    return " ".join(merged)
+
+
+def drop_leading_words(segments, count):
+    """Remove the first count words from a list of segment dicts"""
+    kept = []
+    for segment in segments:
+        words = segment['text'].split()
+        if count >= len(words):
+            count -= len(words)
+            continue
+        if count:
+            segment = dict(segment, text=" " + " ".join(words[count:]))
+            count = 0
+        kept.append(segment)
+    return kept
+
+
+def transcribe_pieces(paths, transcribe_fn, max_workers=4):
+    """Transcribe piece files concurrently and return their texts in order.
+
+    transcribe_fn handles retries/fallback for a single piece, so a failure only
+    affects that piece. Piece files are deleted afterwards.
+    """
+    def _run(path):
+        try:
+            return transcribe_fn(path)
+        except Exception as e:
+            logger.error(f"Piece {os.path.basename(path)} failed: {e}")
+            return None
+        finally:
+            try:
+                os.unlink(path)
+            except OSError as e:
+                logger.error(f"Error deleting piece file: {e}")
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="piece") as executor:
+        return list(executor.map(_run, paths))
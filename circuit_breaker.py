@@ -0,0 +1,123 @@
+import time
+import logging
+import threading
+from collections import deque
+
+logger = logging.getLogger("circuit_breaker")
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+PROBE = 'probe'
+
+# A request also counts as slow past this many extra seconds per second of audio
+SLOW_SECONDS_PER_AUDIO_SECOND = 0.1
+
+
+class CircuitBreaker:
+    """Health of one remote backend over a sliding window of recent requests.
+
+    The circuit opens when, among the requests of the last window_seconds (at
+    least min_requests of them), the share that failed reaches error_rate or
+    the share slower than slow_seconds reaches slow_rate. While it is open,
+    admit() turns requests away so recordings go straight to the next
+    backend. Once cooldown_seconds have passed, one probe request is let
+    through (half-open). If it succeeds in time the circuit closes. Otherwise
+    it opens again, and the cool-down doubles up to max_cooldown_seconds.
+    """
+
+    def __init__(self, name, window_seconds=300.0, min_requests=3, error_rate=0.5, slow_seconds=30.0,
+                 slow_rate=0.8, cooldown_seconds=60.0, max_cooldown_seconds=600.0, clock=time.monotonic):
+        self.name = name
+        self.window_seconds = window_seconds
+        self.min_requests = min_requests
+        self.error_rate = error_rate
+        self.slow_seconds = slow_seconds
+        self.slow_rate = slow_rate
+        self.base_cooldown = cooldown_seconds
+        self.max_cooldown = max_cooldown_seconds
+        self.clock = clock
+        self.state = CLOSED
+        self.times_opened = 0
+        self._outcomes = deque()  # (time, failed, slow) of recent requests
+        self._cooldown = cooldown_seconds
+        self._opened_at = None
+        self._probe_started = None
+        self._lock = threading.Lock()
+
+    def admit(self):
+        """How the next request may use the backend.
+
+        Returns CLOSED for a normal request, PROBE for the single trial
+        request of a half-open circuit, or None when it should be skipped.
+        """
+        with self._lock:
+            if self.state == CLOSED:
+                return CLOSED
+            now = self.clock()
+            if self.state == OPEN and now - self._opened_at < self._cooldown:
+                return None
+            # A probe that never reported back (e.g. it was cancelled) is replaced after a cool-down
+            if self.state == HALF_OPEN and now - self._probe_started < self._cooldown:
+                return None
+            self.state = HALF_OPEN
+            self._probe_started = now
+            logger.info(f"{self.name} circuit half-open, sending a probe request")
+            return PROBE
+
+    def record_success(self, seconds, audio_seconds=0.0):
+        slow = seconds > self.slow_seconds + SLOW_SECONDS_PER_AUDIO_SECOND * audio_seconds
+        self._record(False, slow)
+
+    def record_failure(self):
+        self._record(True, False)
+
+    def _record(self, failed, slow):
+        with self._lock:
+            now = self.clock()
+            if self.state == HALF_OPEN:
+                if failed or slow:
+                    self._open(now, min(self.max_cooldown, self._cooldown * 2),
+                               f"probe request {'failed' if failed else 'was slow'}")
+                else:
+                    self.state = CLOSED
+                    self._cooldown = self.base_cooldown
+                    self._outcomes.clear()
+                    logger.info(f"{self.name} circuit closed, the probe request succeeded")
+                return
+
+            self._outcomes.append((now, failed, slow))
+            while self._outcomes and now - self._outcomes[0][0] > self.window_seconds:
+                self._outcomes.popleft()
+            if self.state == OPEN or len(self._outcomes) < self.min_requests:
+                return
+            total = len(self._outcomes)
+            failures = sum(1 for _, f, _ in self._outcomes if f)
+            slow_calls = sum(1 for _, _, s in self._outcomes if s)
+            if failures / total >= self.error_rate:
+                self._open(now, self.base_cooldown, f"{failures} of the last {total} requests failed")
+            elif slow_calls / total >= self.slow_rate:
+                self._open(now, self.base_cooldown, f"{slow_calls} of the last {total} requests were slow")
+
+    def _open(self, now, cooldown, reason):
+        """Open the circuit (lock must be held)"""
+        self.state = OPEN
+        self.times_opened += 1
+        self._opened_at = now
+        self._cooldown = cooldown
+        self._outcomes.clear()
+        logger.warning(f"{self.name} circuit opened: {reason}. Skipping it for {cooldown:.0f}s")
+
+    def retry_in(self):
+        """Seconds until the next probe may go out (0 unless open)"""
+        with self._lock:
+            if self.state != OPEN:
+                return 0.0
+            return max(0.0, self._cooldown - (self.clock() - self._opened_at))
+
+    def describe(self):
+        if self.state == OPEN:
+            return f"circuit open, retrying in {self.retry_in():.0f}s"
+        if self.state == HALF_OPEN:
+            return "circuit half-open, probing"
+        return "ok"
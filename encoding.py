@@ -0,0 +1,74 @@
+import os
+import time
+import tempfile
+import logging
+
+logger = logging.getLogger("encoding")
+
+# upload_codec -> (container format, file extension, encoder, sample format)
+CODECS = {
+    'flac': ('flac', '.flac', 'flac', 's16'),
+    'opus': ('ogg', '.ogg', 'libopus', 's16'),
+}
+
+
+def encode_audio(wav_path, codec, bitrate=None):
+    """Encode a WAV file with PyAV and return (encoded_path, seconds_taken).
+
+    PyAV ships with faster-whisper. Returns the original path untouched for
+    'wav' or when encoding isn't possible, so callers can always upload the
+    returned path.
+    """
+    if not codec or codec == 'wav':
+        return wav_path, 0.0
+    if codec not in CODECS:
+        logger.warning(f"Unknown upload codec '{codec}', uploading WAV")
+        return wav_path, 0.0
+
+    try:
+        import av
+    except ImportError:
+        logger.warning("PyAV is not installed, uploading WAV (pip install av)")
+        return wav_path, 0.0
+
+    container_format, extension, encoder, sample_format = CODECS[codec]
+    fd, out_path = tempfile.mkstemp(suffix=extension)
+    os.close(fd)
+
+    start_time = time.perf_counter()
+    try:
+        with av.open(wav_path) as src, av.open(out_path, 'w', format=container_format) as dst:
+            in_stream = src.streams.audio[0]
+            rate = in_stream.rate
+            layout = in_stream.layout.name
+            out_stream = dst.add_stream(encoder, rate=rate, layout=layout)
+            if bitrate:
+                out_stream.bit_rate = bitrate
+            resampler = av.AudioResampler(format=sample_format, layout=layout, rate=rate)
+
+            for frame in src.decode(in_stream):
+                for resampled in resampler.resample(frame):
+                    resampled.pts = None
+                    for packet in out_stream.encode(resampled):
+                        dst.mux(packet)
+            for packet in out_stream.encode(None):
+                dst.mux(packet)
+    except Exception as e:
+        logger.error(f"Encoding to {codec} failed, uploading WAV: {e}")
+        if os.path.exists(out_path):
+            os.unlink(out_path)
+        return wav_path, 0.0
+
+    return out_path, time.perf_counter() - start_time
+
+
+def parse_bitrate(value):
+    """Turn '24k' / '24000' / 24000 into bits per second"""
+    if value is None or value == '':
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    value = str(value).strip().lower()
+    if value.endswith('k'):
+        return int(float(value[:-1]) * 1000)
+    return int(value)
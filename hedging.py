@@ -0,0 +1,119 @@
+import math
+import queue
+import logging
+import threading
+from collections import deque
+
+from metrics import quantile
+
+logger = logging.getLogger("hedging")
+
+
+class LatencyTracker:
+    """Recent request latencies per backend, grouped by audio length.
+
+    Audio lengths are bucketed by powers of two seconds, so a 40s clip is
+    compared with other 32-64s clips rather than with hour-long uploads.
+    """
+
+    def __init__(self, window=50, min_samples=5):
+        self.window = window
+        self.min_samples = min_samples
+        self._samples = {}  # (backend, bucket) -> deque of seconds
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _bucket(audio_seconds):
+        return int(math.log2(max(1.0, audio_seconds)))
+
+    def record(self, backend, audio_seconds, seconds):
+        key = (backend, self._bucket(audio_seconds))
+        with self._lock:
+            self._samples.setdefault(key, deque(maxlen=self.window)).append(seconds)
+
+    def p95(self, backend, audio_seconds):
+        """p95 latency for similar audio, or None until there are enough samples"""
+        with self._lock:
+            samples = list(self._samples.get((backend, self._bucket(audio_seconds)), ()))
+        if len(samples) < self.min_samples:
+            return None
+        return quantile(samples, 0.95)
+
+
+def hedged_call(primary, secondary, hedge_after, on_settled=None):
+    """Race two calls, starting the second only when the first is slow.
+
+    primary(cancel) runs at once; secondary(cancel) starts once primary has
+    failed or has run for hedge_after seconds. Each gets a threading.Event
+    that is set when the other one wins. Returns (index, result) of the first
+    call to succeed (0 = primary, 1 = secondary); raises the last error if
+    both fail. The loser may still be running then (an HTTP request can't be
+    interrupted); on_settled is called once every call that was started has
+    returned, so whatever they share can be cleaned up after it.
+    """
+    results = queue.Queue()
+    cancel = (threading.Event(), threading.Event())
+    state = {'started': 0, 'finished': 0, 'decided': False, 'settled': False}
+    lock = threading.Lock()
+
+    def _settle_if_done():
+        with lock:
+            if state['settled'] or not state['decided'] or state['finished'] < state['started']:
+                return
+            state['settled'] = True
+        if on_settled:
+            try:
+                on_settled()
+            except Exception as e:
+                logger.error(f"Hedge cleanup failed: {e}")
+
+    def _run(index, fn):
+        try:
+            results.put((index, fn(cancel[index]), None))
+        except Exception as e:
+            results.put((index, None, e))
+        finally:
+            with lock:
+                state['finished'] += 1
+            _settle_if_done()
+
+    def _start(index, fn):
+        with lock:
+            state['started'] += 1
+        thread = threading.Thread(target=_run, args=(index, fn), name=f"hedge-{'primary' if index == 0 else 'secondary'}")
+        thread.daemon = True
+        thread.start()
+
+    def _decide():
+        with lock:
+            state['decided'] = True
+        _settle_if_done()
+
+    _start(0, primary)
+    running = 1
+    hedged = False
+    error = None
+    while running:
+        try:
+            index, result, exc = results.get(timeout=None if hedged else hedge_after)
+        except queue.Empty:
+            index, result, exc = None, None, None
+
+        # Slow or failed primary: start the secondary alongside it
+        if not hedged and (index is None or exc is not None):
+            if index is None:
+                logger.info(f"No answer after {hedge_after:.1f}s, starting hedge request")
+            hedged = True
+            _start(1, secondary)
+            running += 1
+        if index is None:
+            continue
+
+        running -= 1
+        if exc is None:
+            cancel[1 - index].set()
+            _decide()
+            return index, result
+        error = exc
+    _decide()
+    raise error
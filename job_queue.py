@@ -0,0 +1,203 @@
+import os
+import json
+import time
+import queue
+import shutil
+import logging
+import threading
+from datetime import datetime
+
+logger = logging.getLogger("job_queue")
+
+ACTIVE_STATES = ('pending', 'trimming', 'encoding', 'transcribing', 'formatting', 'saving')
+FINISHED_STATES = ('done', 'failed')
+
+
+class JobQueue:
+    """Crash-safe background queue of recordings waiting to be transcribed.
+
+    Each job is a JSON file next to its audio in jobs_dir, rewritten atomically
+    on every state change. Finished jobs are removed from disk, so whatever is
+    left after a crash is picked up again by resume().
+    """
+
+    def __init__(self, jobs_dir, handler, workers=1, history=50):
+        self.jobs_dir = jobs_dir
+        self.handler = handler  # handler(job, set_state) -> True on success
+        self.workers = workers
+        self.history = history
+        self._jobs = {}  # job id -> job dict (this session plus resumed jobs)
+        self._contexts = {}  # job id -> in-memory extras (not persisted)
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._threads = []
+        self._counter = 0
+        os.makedirs(jobs_dir, exist_ok=True)
+
+    def _job_file(self, job_id):
+        return os.path.join(self.jobs_dir, f"{job_id}.json")
+
+    def _persist(self, job):
+        """Atomically write the job file"""
+        path = self._job_file(job['id'])
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(job, f, indent=2)
+        os.replace(tmp_path, path)
+
+    def _remove_job_file(self, job_id):
+        try:
+            os.unlink(self._job_file(job_id))
+        except FileNotFoundError:
+            pass
+
+    def submit(self, audio_path, stop_time=None, context=None, **fields):
+        """Move the recording into the queue directory and enqueue it.
+
+        Extra fields are stored in the job (and its file), so they survive a restart.
+        """
+        with self._lock:
+            self._counter += 1
+            job_id = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{self._counter}"
+
+        # A rename when the recording is already on the same filesystem (ideally in jobs_dir)
+        job_audio = os.path.join(self.jobs_dir, f"{job_id}{os.path.splitext(audio_path)[1] or '.wav'}")
+        shutil.move(audio_path, job_audio)
+
+        job = {
+            'id': job_id,
+            'audio_path': job_audio,
+            'state': 'pending',
+            'created': time.time(),
+            'stop_time': stop_time,
+            'updated': time.time(),
+            'error': None,
+            'result_file': None,
+        }
+        job.update(fields)
+        with self._lock:
+            self._jobs[job_id] = job
+            if context:
+                self._contexts[job_id] = context
+        self._persist(job)
+        self._queue.put(job_id)
+        logger.info(f"Queued job {job_id}")
+        return job
+
+    def resume(self):
+        """Re-queue jobs left unfinished by a previous run"""
+        resumed = 0
+        for file in sorted(os.listdir(self.jobs_dir)):
+            if not file.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.jobs_dir, file), 'r', encoding='utf-8') as f:
+                    job = json.load(f)
+            except Exception as e:
+                logger.error(f"Could not read job file {file}: {e}")
+                continue
+
+            if job.get('state') in FINISHED_STATES:
+                self._remove_job_file(job['id'])
+                continue
+            if not os.path.exists(job.get('audio_path', '')):
+                logger.error(f"Audio for job {job['id']} is missing, dropping it")
+                self._remove_job_file(job['id'])
+                continue
+
+            job['state'] = 'pending'
+            job['updated'] = time.time()
+            with self._lock:
+                self._jobs[job['id']] = job
+            self._persist(job)
+            self._queue.put(job['id'])
+            resumed += 1
+
+        if resumed:
+            logger.info(f"Resumed {resumed} unfinished job(s)")
+        return resumed
+
+    def start(self):
+        """Start the worker threads"""
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"job-worker-{i + 1}")
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout=1.0):
+        """Ask workers to exit after their current job; unfinished jobs stay on disk"""
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join(timeout=timeout)
+        self._threads = []
+
+    def context(self, job_id):
+        """In-memory extras passed to submit()"""
+        with self._lock:
+            return self._contexts.get(job_id, {})
+
+    def set_state(self, job, state, **fields):
+        """Record a job state change on disk"""
+        with self._lock:
+            job['state'] = state
+            job['updated'] = time.time()
+            job.update(fields)
+        if state in FINISHED_STATES:
+            self._remove_job_file(job['id'])
+        else:
+            self._persist(job)
+
+    def _worker(self):
+        while True:
+            job_id = self._queue.get()
+            if job_id is None:
+                break
+            with self._lock:
+                job = self._jobs.get(job_id)
+            if job is None:
+                continue
+
+            try:
+                ok = self.handler(job, lambda state, **fields: self.set_state(job, state, **fields))
+                if job['state'] not in FINISHED_STATES:
+                    self.set_state(job, 'done' if ok else 'failed')
+            except Exception as e:
+                logger.error(f"Job {job_id} crashed: {e}")
+                self.set_state(job, 'failed', error=str(e))
+            finally:
+                with self._lock:
+                    self._contexts.pop(job_id, None)
+                self._trim_history()
+
+    def _trim_history(self):
+        """Forget the oldest finished jobs beyond the history limit"""
+        with self._lock:
+            finished = [j for j in self._jobs.values() if j['state'] in FINISHED_STATES]
+            for job in sorted(finished, key=lambda j: j['updated'])[:max(0, len(finished) - self.history)]:
+                del self._jobs[job['id']]
+
+    def depth(self):
+        """Number of jobs waiting or in progress"""
+        with self._lock:
+            return sum(1 for j in self._jobs.values() if j['state'] in ACTIVE_STATES)
+
+    def stats(self):
+        """Count of jobs per state"""
+        counts = {}
+        with self._lock:
+            for job in self._jobs.values():
+                counts[job['state']] = counts.get(job['state'], 0) + 1
+        return counts
+
+    def job(self, job_id):
+        """Copy of one job, or None if it is unknown (or long finished)"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def jobs(self):
+        """All known jobs, newest first"""
+        with self._lock:
+            return sorted((dict(j) for j in self._jobs.values()), key=lambda j: j['created'], reverse=True)
@@ -0,0 +1,222 @@
+import os
+import sys
+import json
+import math
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+logger = logging.getLogger("metrics")
+
+QUANTILES = (0.5, 0.95)
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process since it started, in MB (None if unavailable).
+
+    This is the process's high-water mark, not the peak of any one recording:
+    in a long-running recorder or server it stays at the largest job so far.
+    """
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports KB, macOS reports bytes
+        return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+    except ImportError:
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().peak_wset / (1024 * 1024)
+    except Exception:
+        return None
+
+
+class RecordingMetrics:
+    """Per-recording timings and counters, from F8 to the saved markdown.
+
+    Stages may run several times (pieces, segments); their times are summed.
+    Safe to update from worker threads.
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self.stages = {}  # stage -> seconds
+        self.fields = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name):
+        """Time a block of work as one stage"""
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start_time)
+
+    def add_time(self, name, seconds):
+        with self._lock:
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def set(self, **fields):
+        with self._lock:
+            self.fields.update(fields)
+
+    def add(self, field, amount):
+        with self._lock:
+            self.fields[field] = self.fields.get(field, 0) + amount
+
+    def add_backend(self, backend):
+        """Record a backend that produced (part of) the transcript"""
+        with self._lock:
+            backends = self.fields.setdefault('backends', [])
+            if backend not in backends:
+                backends.append(backend)
+
+    def to_dict(self):
+        with self._lock:
+            record = {
+                'timestamp': datetime.fromtimestamp(self.started).isoformat(timespec='seconds'),
+                'stages': {name: round(seconds, 4) for name, seconds in self.stages.items()},
+            }
+            record.update(self.fields)
+        record['backend'] = "+".join(record.pop('backends', [])) or None
+        audio_seconds = record.get('audio_seconds')
+        processing = record.get('stop_to_file_seconds')
+        if audio_seconds and processing is not None:
+            record['rtf'] = round(processing / audio_seconds, 4)
+        record['process_peak_rss_mb'] = peak_rss_mb()  # So far, for the whole process
+        return record
+
+
+class NullMetrics:
+    """Stand-in when nothing is being measured"""
+
+    @contextmanager
+    def stage(self, name):
+        yield
+
+    def add_time(self, name, seconds):
+        pass
+
+    def set(self, **fields):
+        pass
+
+    def add(self, field, amount):
+        pass
+
+    def add_backend(self, backend):
+        pass
+
+
+def quantile(values, q):
+    """Nearest-rank quantile of a list of numbers"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))
+    return ordered[index]
+
+
+def load_records(path, limit=None):
+    """Read metric records from a JSONL file (the last `limit` if given)"""
+    records = []
+    if not os.path.exists(path):
+        return records
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue
+    return records[-limit:] if limit else records
+
+
+def summarize(records):
+    """p50/p95 of every stage plus totals, keyed by metric name"""
+    series = {}
+    for record in records:
+        for stage, seconds in record.get('stages', {}).items():
+            series.setdefault(stage, []).append(seconds)
+        for field in ('stop_to_file_seconds', 'hotkey_to_first_sample_seconds', 'rtf'):
+            if record.get(field) is not None:
+                series.setdefault(field, []).append(record[field])
+    return {
+        name: {'count': len(values), 'sum': sum(values),
+               **{f"p{int(q * 100)}": quantile(values, q) for q in QUANTILES}}
+        for name, values in series.items()
+    }
+
+
+def prometheus_text(records):
+    """Render a Prometheus text-format summary of the records"""
+    lines = [
+        "# HELP writethisdown_stage_seconds Time spent per pipeline stage",
+        "# TYPE writethisdown_stage_seconds summary",
+    ]
+    for name, stats in sorted(summarize(records).items()):
+        for q in QUANTILES:
+            lines.append(f'writethisdown_stage_seconds{{stage="{name}",quantile="{q}"}} {stats[f"p{int(q * 100)}"]}')
+        lines.append(f'writethisdown_stage_seconds_sum{{stage="{name}"}} {stats["sum"]}')
+        lines.append(f'writethisdown_stage_seconds_count{{stage="{name}"}} {stats["count"]}')
+
+    backends = {}
+    for record in records:
+        backend = record.get('backend') or 'none'
+        backends[backend] = backends.get(backend, 0) + 1
+    lines.append("# HELP writethisdown_recordings_total Recordings processed per backend")
+    lines.append("# TYPE writethisdown_recordings_total counter")
+    for backend, count in sorted(backends.items()):
+        lines.append(f'writethisdown_recordings_total{{backend="{backend}"}} {count}')
+    return "\n".join(lines) + "\n"
+
+
+class MetricsWriter:
+    """Appends one JSON line per recording and optionally keeps a Prometheus
+    text file (for node_exporter's textfile collector) up to date"""
+
+    def __init__(self, jsonl_path, prometheus_path=None, window=5000):
+        self.jsonl_path = jsonl_path
+        self.prometheus_path = prometheus_path
+        self.window = window
+        self._recent = None  # records used for the Prometheus summary
+        self._lock = threading.Lock()
+
+    def write(self, metrics):
+        record = metrics.to_dict()
+        try:
+            with self._lock:
+                with open(self.jsonl_path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(record) + "\n")
+                if self.prometheus_path:
+                    if self._recent is None:
+                        self._recent = load_records(self.jsonl_path, self.window)
+                    else:
+                        self._recent.append(record)
+                        del self._recent[:-self.window]
+                    tmp_path = self.prometheus_path + ".tmp"
+                    with open(tmp_path, 'w', encoding='utf-8') as f:
+                        f.write(prometheus_text(self._recent))
+                    os.replace(tmp_path, self.prometheus_path)
+        except Exception as e:
+            logger.error(f"Error writing metrics: {e}")
+        return record
+
+
+if __name__ == "__main__":
+    # Summarize recorded metrics: python metrics.py [transcriptions/metrics.jsonl]
+    path = sys.argv[1] if len(sys.argv) > 1 else os.path.join("transcriptions", "metrics.jsonl")
+    records = load_records(path)
+    if not records:
+        print(f"No metrics found in {path}")
+        sys.exit(1)
+
+    print(f"{len(records)} recording(s) in {path}\n")
+    print(f"{'metric':<24}{'count':>8}{'p50':>12}{'p95':>12}")
+    print("-" * 56)
+    for name, stats in sorted(summarize(records).items()):
+        print(f"{name:<24}{stats['count']:>8}{stats['p50']:>12.3f}{stats['p95']:>12.3f}")
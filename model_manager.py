@@ -0,0 +1,159 @@
+import gc
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger("model_manager")
+
+# Approximate resident memory (MB) of each faster-whisper model on CPU in float32.
+# int8 variants use roughly half of this. Used only for the eviction budget.
+MODEL_MEMORY_MB = {
+    'tiny': 150,
+    'tiny.en': 150,
+    'base': 300,
+    'base.en': 300,
+    'small': 900,
+    'small.en': 900,
+    'medium': 2300,
+    'medium.en': 2300,
+    'large-v1': 4500,
+    'large-v2': 4500,
+    'large-v3': 4500,
+    'large': 4500,
+    'distil-large-v3': 3000,
+}
+
+DEFAULT_MEMORY_BUDGET_MB = 2048
+
+
+class ModelManager:
+    """Keeps loaded faster-whisper models warm and shares them across callers.
+
+    Models are keyed by (size, device, compute_type) plus the load-time
+    settings (cpu_threads, num_workers, ...), so callers asking for different
+    settings don't silently share a model loaded with someone else's. Models
+    are evicted least recently used first once the estimated memory of all
+    loaded models exceeds the budget.
+    """
+
+    def __init__(self, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB):
+        self.memory_budget_mb = memory_budget_mb
+        self._models = OrderedDict()  # key -> (model, estimated_mb)
+        self._lock = threading.Lock()
+        self._key_locks = {}  # key -> lock held while that model is loading
+
+    @staticmethod
+    def estimate_memory_mb(size, compute_type='default'):
+        """Estimate how much memory a model will take once loaded"""
+        base_mb = MODEL_MEMORY_MB.get(size, MODEL_MEMORY_MB['large'])
+        if compute_type and compute_type.startswith('int8'):
+            return base_mb // 2
+        return base_mb
+
+    @staticmethod
+    def model_key(size='base', device='cpu', compute_type='default', **model_kwargs):
+        """Cache key of a model loaded with these settings"""
+        return (size, device, compute_type, tuple(sorted(model_kwargs.items())))
+
+    def is_loaded(self, size='base', device='cpu', compute_type='default', **model_kwargs):
+        """Check whether a model is already warm"""
+        with self._lock:
+            return self.model_key(size, device, compute_type, **model_kwargs) in self._models
+
+    def loaded_models(self):
+        """Return the keys of all loaded models, least recently used first"""
+        with self._lock:
+            return list(self._models.keys())
+
+    def get_model(self, size='base', device='cpu', compute_type='default', **model_kwargs):
+        """Return a loaded model, loading it on first use.
+
+        Extra keyword arguments (cpu_threads, num_workers, ...) are passed to
+        WhisperModel when the model is first loaded.
+        """
+        key = self.model_key(size, device, compute_type, **model_kwargs)
+
+        with self._lock:
+            if key in self._models:
+                self._models.move_to_end(key)
+                return self._models[key][0]
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        # Only one thread loads a given model; others wait and reuse it
+        with key_lock:
+            with self._lock:
+                if key in self._models:
+                    self._models.move_to_end(key)
+                    return self._models[key][0]
+
+            from faster_whisper import WhisperModel
+
+            logger.info(f"Loading Whisper model '{size}' ({device}, {compute_type})...")
+            start_time = time.perf_counter()
+            model = WhisperModel(size, device=device, compute_type=compute_type, **model_kwargs)
+            logger.info(f"Whisper model '{size}' loaded in {time.perf_counter() - start_time:.2f}s")
+
+            estimated_mb = self.estimate_memory_mb(size, compute_type)
+            with self._lock:
+                self._models[key] = (model, estimated_mb)
+                self._evict_over_budget(keep=key)
+            return model
+
+    def preload(self, size='base', device='cpu', compute_type='default', **model_kwargs):
+        """Load a model on a background thread so the first fallback is fast"""
+        def _load():
+            try:
+                self.get_model(size, device, compute_type, **model_kwargs)
+            except Exception as e:
+                logger.error(f"Background model preload failed: {e}")
+
+        thread = threading.Thread(target=_load, name="whisper-preload")
+        thread.daemon = True
+        thread.start()
+        return thread
+
+    def evict(self, size='base', device='cpu', compute_type='default', **model_kwargs):
+        """Drop a model from the cache"""
+        with self._lock:
+            removed = self._models.pop(self.model_key(size, device, compute_type, **model_kwargs), None)
+        if removed:
+            gc.collect()
+        return removed is not None
+
+    def clear(self):
+        """Drop all loaded models"""
+        with self._lock:
+            self._models.clear()
+        gc.collect()
+
+    def _evict_over_budget(self, keep):
+        """Evict least recently used models until the budget is met (lock must be held)"""
+        evicted = False
+        total_mb = sum(mb for _, mb in self._models.values())
+        for key in list(self._models.keys()):
+            if total_mb <= self.memory_budget_mb:
+                break
+            if key == keep:
+                continue
+            _, mb = self._models.pop(key)
+            total_mb -= mb
+            evicted = True
+            logger.info(f"Evicted Whisper model {key} to stay within {self.memory_budget_mb}MB budget")
+        if evicted:
+            gc.collect()
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_model_manager(memory_budget_mb=None):
+    """Return the process-wide model manager, creating it on first use"""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = ModelManager(memory_budget_mb or DEFAULT_MEMORY_BUDGET_MB)
+        elif memory_budget_mb is not None:
+            _manager.memory_budget_mb = memory_budget_mb
+        return _manager
@@ -0,0 +1,108 @@
+import os
+import threading
+import logging
+
+logger = logging.getLogger("progressive")
+
+
+def format_timestamp(seconds):
+    seconds = int(seconds)
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+def capitalize_sentences(text, sentence_start=True):
+    """Capitalize each sentence in text; the first only if sentence_start"""
+    parts = text.split('. ')
+    for i, part in enumerate(parts):
+        if part and (i > 0 or sentence_start):
+            parts[i] = part[0].upper() + part[1:]
+    return '. '.join(parts)
+
+
+class ProgressiveWriter:
+    """Appends transcript segments to a markdown file as they are decoded.
+
+    The file is created on the first segment, at the path returned by
+    new_path() (so the name is only claimed once there is text). Without timestamps the text
+    grows as one paragraph; with timestamps each segment gets its own line.
+    raw_text() is what the backend will return, so the caller can tell
+    whether the file holds the whole transcript.
+    """
+
+    def __init__(self, new_path, header, timestamps=False, echo=True):
+        self.new_path = new_path
+        self.path = None
+        self.header = header
+        self.timestamps = timestamps
+        self.echo = echo
+        self.on_first_text = None  # Called once when the first text is written
+        self._file = None
+        self._raw = []
+        self._sentence_start = True
+        self._lock = threading.Lock()
+
+    @property
+    def started(self):
+        return self._file is not None
+
+    def raw_text(self):
+        return " ".join(self._raw)
+
+    def add(self, segment):
+        """Format one segment and append it to the file (and terminal)"""
+        with self._lock:
+            self._raw.append(segment['text'])
+            text = segment['text'].strip()
+            if not text:
+                return
+
+            first = self._file is None
+            if first:
+                self.path = self.new_path()
+                self._file = open(self.path, 'w', encoding='utf-8')
+                self._file.write(self.header)
+                if self.echo:
+                    print("\nLive transcription:")
+                    print("-" * 60)
+
+            text = capitalize_sentences(text, self._sentence_start)
+            self._sentence_start = text[-1] in '.!?'
+            if self.timestamps:
+                chunk = f"**[{format_timestamp(segment['start'])}]** {text}\n\n"
+            else:
+                chunk = text if first else " " + text
+            self._file.write(chunk)
+            self._file.flush()
+            if self.echo and self.timestamps:
+                print(chunk.rstrip("\n"), flush=True)
+            elif self.echo:
+                print(chunk, end="", flush=True)
+
+        if first and self.on_first_text:
+            self.on_first_text()
+
+    def finish(self):
+        """Close the file, ending the last sentence; returns its path"""
+        with self._lock:
+            if self._file is None:
+                return None
+            if not self.timestamps:
+                # End the paragraph with a period, like format_text does
+                self._file.write("\n" if self._sentence_start else ".\n")
+            self._file.close()
+            self._file = None
+            if self.echo:
+                print("\n" + "-" * 60)
+            return self.path
+
+    def discard(self):
+        """Close and delete a partial file"""
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.close()
+            self._file = None
+            try:
+                os.unlink(self.path)
+            except OSError as e:
+                logger.error(f"Could not remove partial transcription {self.path}: {e}")
@@ -1,69 +1,268 @@
-# quick_transcribe.py - Handle your failed recording locally
+# quick_transcribe.py - Handle your failed recordings locally
 
 import os
 import sys
-import subprocess
+import glob
+import time
+import json
+import argparse
+import importlib.util
 from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from model_manager import get_model_manager
+from transcript_cache import TranscriptCache, pcm_hash, cache_key, transcript_settings
+from backends import LocalBackend
+from metrics import NullMetrics
+from audio_sink import PcmAudio
 
-def transcribe_with_local_whisper(audio_file_path):
+# Settings used by batch worker processes (set by _init_worker)
+_worker_settings = {}
+
+# CPU threads given to each shard of a long recording
+SHARD_THREADS = 2
+
+def split_threads(threads, shards=None):
+    """Divide threads between concurrent shards; returns (num_workers, cpu_threads)"""
+    shards = shards or max(1, threads // SHARD_THREADS)
+    return shards, max(1, threads // shards)
+
+def load_local_settings(config_file="transcription_config.json"):
+    """Local model settings from the main config (as written by autotune.py)"""
+    settings = {'model_size': "base", 'device': "cpu", 'compute_type': "default",
+                'language': "en", 'cpu_threads': 0, 'num_workers': 1, 'beam_size': 5, 'cache_max_mb': 100}
+    try:
+        with open(config_file, 'r') as f:
+            config = json.load(f)
+    except (OSError, ValueError):
+        return settings
+    for key, config_key in (('model_size', 'local_model'), ('device', 'local_device'),
+                            ('compute_type', 'local_compute_type'), ('language', 'language'),
+                            ('cpu_threads', 'local_cpu_threads'), ('num_workers', 'local_num_workers'),
+                            ('beam_size', 'local_beam_size'), ('cache_max_mb', 'cache_max_mb')):
+        if config_key in config:
+            settings[key] = config[config_key]
+    return settings
+
+def transcribe_audio(audio_file_path, model_size="base", device="cpu", compute_type="default",
+                     language="en", cpu_threads=0, beam_size=5, num_workers=1, cache_dir=None, cache_max_mb=100):
+    """Transcribe one file with the shared model; returns (text, audio_seconds).
+
+    With num_workers > 1, long recordings are split at silence and the shards
+    decoded in parallel. With cache_dir, a cached transcript of the same audio
+    and settings is reused (including one the recorder's local fallback made).
+    """
+    backend = LocalBackend(get_model_manager(), model=model_size, device=device, compute_type=compute_type,
+                           cpu_threads=cpu_threads, num_workers=num_workers, beam_size=beam_size)
+    # Read once; the hash and the model both use the same PCM
+    audio = PcmAudio.from_wav(audio_file_path)
+    cache = None
+    if cache_dir:
+        cache = TranscriptCache(cache_dir, cache_max_mb)
+        key = cache_key(pcm_hash(audio.pcm, audio.channels, audio.sample_width, audio.rate),
+                        transcript_settings(language, backend))
+        entry = cache.get(key)
+        if entry is not None:
+            return entry['text'], entry.get('audio_seconds', 0.0)
+
+    start_time = time.perf_counter()
+    segment_list = []
+    transcription = backend.transcribe(audio, language, NullMetrics(), on_segment=segment_list.append)
+    audio_seconds = audio.duration
+
+    if cache:
+        cache.put(key, transcription, segment_list, backend=backend.name, language=language,
+                  audio_seconds=round(audio_seconds, 3), transcribe_seconds=round(time.perf_counter() - start_time, 3))
+    return transcription, audio_seconds
+
+def write_transcription(audio_file_path, transcription, output_file):
+    """Save a local transcription as markdown"""
+    content = f"# Local Transcription {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n"
+    content += f"Source: {os.path.basename(audio_file_path)}\n\n"
+    content += transcription
+
+    with open(output_file, 'w', encoding='utf-8') as f:
+        f.write(content)
+
+def transcribe_with_local_whisper(audio_file_path, cache_dir=None, settings=None):
     """Transcribe using local faster-whisper"""
+    settings = settings or load_local_settings()
     try:
-        print("Installing faster-whisper if not already installed...")
-        subprocess.check_call([sys.executable, '-m', 'pip', 'install', 'faster-whisper'])
-        
-        from faster_whisper import WhisperModel
-        
-        print("Loading Whisper model (this might take a moment on first run)...")
-        model = WhisperModel("base", device="cpu")  # Change to "cuda" if you have GPU
-        
+        manager = get_model_manager()
+        if not manager.is_loaded(settings['model_size'], settings['device'], settings['compute_type'],
+                                 cpu_threads=settings['cpu_threads'], num_workers=settings['num_workers']):
+            print("Loading Whisper model (this might take a moment on first run)...")
+
         print("Transcribing...")
-        segments, info = model.transcribe(audio_file_path, language="en")
-        
-        transcription = " ".join([segment.text for segment in segments])
-        
+        transcription, _ = transcribe_audio(audio_file_path, cache_dir=cache_dir, **settings)
+
         # Save the transcription
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         output_file = f"transcription_local_{timestamp}.md"
-        
-        content = f"# Local Transcription {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n"
-        content += f"Source: {os.path.basename(audio_file_path)}\n\n"
-        content += transcription
-        
-        with open(output_file, 'w', encoding='utf-8') as f:
-            f.write(content)
-        
+        write_transcription(audio_file_path, transcription, output_file)
+
         print(f"\n✅ Transcription saved to: {output_file}")
         print("\nTranscription:")
         print("-" * 60)
         print(transcription)
         print("-" * 60)
-        
+
         return transcription
-        
+
     except Exception as e:
         print(f"❌ Local transcription failed: {e}")
         return None
 
+def transcribed_sources(*directories):
+    """Names of audio files that already have a local transcription"""
+    sources = set()
+    for directory in directories:
+        for path in glob.glob(os.path.join(directory, "transcription_local_*.md")):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    for _ in range(5):
+                        line = f.readline()
+                        if line.startswith("Source: "):
+                            sources.add(line[len("Source: "):].strip())
+                            break
+            except OSError:
+                continue
+    return sources
+
+def find_untranscribed(directory, include_all=False, output_dir=None):
+    """Failed recordings (or every WAV) in directory without a transcription yet"""
+    pattern = "*.wav" if include_all else "failed_recording_*.wav"
+    done = transcribed_sources(directory, output_dir or directory, ".")
+    return sorted(path for path in glob.glob(os.path.join(directory, pattern))
+                  if os.path.basename(path) not in done)
+
+def _init_worker(settings):
+    """Load one model per worker process up front"""
+    _worker_settings.update(settings)
+    get_model_manager().get_model(
+        settings['model_size'], device=settings['device'],
+        compute_type=settings['compute_type'], cpu_threads=settings['cpu_threads'],
+        num_workers=settings['num_workers']
+    )
+
+def _transcribe_worker(audio_file_path, output_dir):
+    """Transcribe one file in a worker process; returns (path, output, audio_seconds, seconds)"""
+    start_time = time.perf_counter()
+    transcription, audio_seconds = transcribe_audio(audio_file_path, **_worker_settings)
+    stem = os.path.splitext(os.path.basename(audio_file_path))[0]
+    output_file = os.path.join(output_dir, f"transcription_local_{stem}.md")
+    write_transcription(audio_file_path, transcription, output_file)
+    return audio_file_path, output_file, audio_seconds, time.perf_counter() - start_time
+
+def batch_transcribe(directory, output_dir=None, include_all=False, workers=None,
+                     model_size="base", device="cpu", compute_type="default", language="en", use_cache=True,
+                     beam_size=5, cache_max_mb=100):
+    """Transcribe every untranscribed recording in directory across a process pool"""
+    output_dir = output_dir or directory
+    os.makedirs(output_dir, exist_ok=True)
+    files = find_untranscribed(directory, include_all, output_dir)
+    if not files:
+        print("Nothing to transcribe - every recording already has output.")
+        return []
+
+    cores = os.cpu_count() or 1
+    workers = max(1, min(workers or cores, len(files)))
+    # Split cores between workers; a worker with spare cores shards long recordings
+    num_workers, cpu_threads = split_threads(max(1, cores // workers))
+    settings = {
+        'model_size': model_size,
+        'device': device,
+        'compute_type': compute_type,
+        'language': language,
+        'beam_size': beam_size,
+        'cpu_threads': cpu_threads,
+        'num_workers': num_workers,
+        'cache_dir': os.path.join(directory, "cache") if use_cache else None,
+        'cache_max_mb': cache_max_mb,
+    }
+
+    print(f"Transcribing {len(files)} file(s) with {workers} worker(s), "
+          f"{num_workers} shard(s) x {cpu_threads} thread(s) each...")
+    results = []
+    start_time = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(settings,)) as executor:
+        futures = {executor.submit(_transcribe_worker, path, output_dir): path for path in files}
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                _, output_file, audio_seconds, seconds = future.result()
+            except Exception as e:
+                print(f"❌ {os.path.basename(path)}: {e}")
+                continue
+            rtf = seconds / audio_seconds if audio_seconds else 0.0
+            results.append((path, output_file, audio_seconds, seconds))
+            print(f"✅ {os.path.basename(path)}: {audio_seconds:.1f}s audio in {seconds:.1f}s (RTF {rtf:.2f}) -> {output_file}")
+
+    wall_seconds = time.perf_counter() - start_time
+    total_audio = sum(r[2] for r in results)
+    print("-" * 60)
+    print(f"{len(results)}/{len(files)} file(s), {total_audio:.1f}s audio in {wall_seconds:.1f}s")
+    if total_audio:
+        print(f"Aggregate RTF: {wall_seconds / total_audio:.3f} ({total_audio / wall_seconds:.1f}x real time)")
+    return results
+
+def parse_args():
+    defaults = load_local_settings()
+    parser = argparse.ArgumentParser(description="Transcribe failed recordings locally with faster-whisper")
+    parser.add_argument("--batch", nargs="?", const="transcriptions", metavar="DIR",
+                        help="Transcribe every untranscribed recording in DIR (default: transcriptions)")
+    parser.add_argument("--all", action="store_true", help="In batch mode, include every WAV, not just failed_recording_*")
+    parser.add_argument("--output-dir", help="Where batch transcriptions go (default: next to the recordings)")
+    parser.add_argument("--workers", type=int, help="Worker processes (default: one per core)")
+    # Defaults come from transcription_config.json (see autotune.py)
+    parser.add_argument("--model", default=defaults['model_size'], help="faster-whisper model size")
+    parser.add_argument("--device", default=defaults['device'], help="cpu or cuda")
+    parser.add_argument("--compute-type", default=defaults['compute_type'], help="int8, float32, ...")
+    parser.add_argument("--beam-size", type=int, default=defaults['beam_size'])
+    parser.add_argument("--language", default=defaults['language'])
+    parser.add_argument("--shards", type=int, help="Parallel shards for a long recording (default: one per 2 cores)")
+    parser.add_argument("--no-cache", action="store_true", help="Don't reuse or store cached transcripts")
+    return parser.parse_args()
+
 if __name__ == "__main__":
+    args = parse_args()
+
+    if importlib.util.find_spec("faster_whisper") is None:
+        print("faster-whisper is not installed. Run: pip install -r requirements.txt")
+        sys.exit(1)
+
+    if args.batch:
+        if not os.path.isdir(args.batch):
+            print(f"Directory not found: {args.batch}")
+            sys.exit(1)
+        batch_transcribe(args.batch, args.output_dir, args.all, args.workers,
+                         args.model, args.device, args.compute_type, args.language, not args.no_cache,
+                         args.beam_size, load_local_settings()['cache_max_mb'])
+        sys.exit(0)
+
     # Look for the most recent failed recording
     transcriptions_dir = "transcriptions"
-    
+
     if not os.path.exists(transcriptions_dir):
         print("No transcriptions directory found!")
         sys.exit(1)
-    
-    failed_recordings = [f for f in os.listdir(transcriptions_dir) 
+
+    failed_recordings = [f for f in os.listdir(transcriptions_dir)
                         if f.startswith('failed_recording_') and f.endswith('.wav')]
-    
+
     if not failed_recordings:
         print("No failed recordings found!")
         sys.exit(1)
-    
+
     # Get the most recent failed recording
     failed_recordings.sort(reverse=True)
     latest_recording = os.path.join(transcriptions_dir, failed_recordings[0])
-    
+
     print(f"Found failed recording: {latest_recording}")
     print("Attempting local transcription...")
-    
-    transcribe_with_local_whisper(latest_recording)
+
+    num_workers, cpu_threads = split_threads(os.cpu_count() or 1, args.shards)
+    settings = dict(load_local_settings(), model_size=args.model, device=args.device,
+                    compute_type=args.compute_type, language=args.language, beam_size=args.beam_size,
+                    num_workers=num_workers, cpu_threads=cpu_threads)
+    transcribe_with_local_whisper(latest_recording, None if args.no_cache else os.path.join(transcriptions_dir, "cache"),
+                                  settings)
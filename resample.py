@@ -0,0 +1,87 @@
+import logging
+
+import numpy as np
+
+logger = logging.getLogger("resample")
+
+ZERO_CROSSINGS = 16  # Sinc lobes on each side of the kernel; more is sharper and slower
+PHASES = 256  # Kernel table resolution between two input samples
+
+
+class StreamingResampler:
+    """Converts int16 PCM chunks to mono at another sample rate.
+
+    Channels are averaged, then each output sample is a windowed-sinc
+    interpolation of the input around it, computed for a whole chunk at once
+    from a precomputed kernel table. Input that the kernel still needs is
+    carried over to the next chunk, so chunk boundaries leave no clicks and
+    the output length tracks the input exactly. Call flush() after the last
+    chunk to get the final few milliseconds.
+    """
+
+    def __init__(self, in_rate, in_channels, out_rate=16000):
+        self.in_rate = int(in_rate)
+        self.in_channels = in_channels
+        self.out_rate = int(out_rate)
+        self._step = self.in_rate / self.out_rate  # Input samples per output sample
+        self._frame_bytes = 2 * in_channels
+        self._pending = b''  # Partial frame left over from the last chunk
+
+        # Low-pass at the lower of the two Nyquist rates (with a little margin against aliasing)
+        cutoff = min(1.0, self.out_rate / self.in_rate) * 0.95
+        self._half = int(np.ceil(ZERO_CROSSINGS / cutoff))
+        self._offsets = np.arange(-self._half + 1, self._half + 1)
+        fractions = np.arange(PHASES + 1) / PHASES
+        x = self._offsets[None, :] - fractions[:, None]
+        window = 0.5 + 0.5 * np.cos(np.pi * np.clip(x / self._half, -1.0, 1.0))  # Hann
+        table = np.sinc(cutoff * x) * window
+        self._table = (table / table.sum(axis=1, keepdims=True)).astype(np.float32)
+
+        # Start with a kernel's worth of silence so the first output lines up with the first input
+        self._buffer = np.zeros(self._half, dtype=np.float32)
+        self._time = float(self._half)
+
+    @property
+    def passthrough(self):
+        return self.in_rate == self.out_rate and self.in_channels == 1
+
+    def _mono(self, data):
+        data = self._pending + bytes(data)
+        usable = len(data) - len(data) % self._frame_bytes
+        self._pending = data[usable:]
+        samples = np.frombuffer(data[:usable], dtype=np.int16)
+        if self.in_channels == 1:
+            return samples.astype(np.float32)
+        return samples.reshape(-1, self.in_channels).mean(axis=1, dtype=np.float32)
+
+    def process(self, data):
+        """Convert one chunk; returns int16 mono PCM bytes (possibly empty)"""
+        if self.passthrough:
+            return data
+        buffer = np.concatenate([self._buffer, self._mono(data)])
+
+        # Output samples whose kernel is fully covered by the buffered input
+        last = len(buffer) - self._half - 1
+        if self._time > last:
+            self._buffer = buffer
+            return b''
+        count = int((last - self._time) // self._step) + 1
+        times = self._time + np.arange(count) * self._step
+        base = np.floor(times).astype(np.int64)
+        phases = np.rint((times - base) * PHASES).astype(np.int64)
+        out = np.einsum('ij,ij->i', buffer[base[:, None] + self._offsets[None, :]], self._table[phases])
+
+        # Keep only the input the next output samples still need
+        next_time = times[-1] + self._step
+        drop = max(0, int(next_time) - self._half + 1)
+        self._buffer = buffer[drop:]
+        self._time = next_time - drop
+        return np.clip(np.rint(out), -32768, 32767).astype(np.int16).tobytes()
+
+    def flush(self):
+        """Convert the audio still held back for the kernel (call once at the end)"""
+        if self.passthrough:
+            return b''
+        held = len(self._buffer) - self._time
+        tail = self.process(bytes(self._frame_bytes * (self._half + 1)))
+        return tail[:max(0, int(held / self._step)) * 2]
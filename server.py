@@ -0,0 +1,544 @@
+# server.py - Headless transcription daemon: many clients share one pipeline and its warm models
+
+import os
+import re
+import sys
+import json
+import time
+import wave
+import shutil
+import argparse
+import tempfile
+import threading
+import logging
+import http.client
+from collections import deque
+from urllib.parse import urlparse, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from transcription import TranscriptionTool
+from job_queue import JobQueue, ACTIVE_STATES, FINISHED_STATES
+from audio_sink import WavFileSink, wav_duration
+from metrics import RecordingMetrics, NullMetrics, quantile
+
+logger = logging.getLogger("server")
+
+READ_BLOCK = 1 << 16
+UPLOAD_PREFIX = "upload_"
+
+
+def client_name(raw):
+    """Filesystem-safe client name ('default' if none was given)"""
+    name = re.sub(r'[^A-Za-z0-9_.-]', '_', (raw or '').strip())[:64].lstrip('.')
+    return name or 'default'
+
+
+def read_length(rfile, length):
+    """Yield a request body of known length"""
+    remaining = length
+    while remaining > 0:
+        data = rfile.read(min(remaining, READ_BLOCK))
+        if not data:
+            raise ConnectionError("Upload ended early")
+        remaining -= len(data)
+        yield data
+
+
+def read_chunked(rfile):
+    """Yield a request body sent with Transfer-Encoding: chunked"""
+    while True:
+        size = int(rfile.readline(1024).split(b';')[0].strip() or b'0', 16)
+        if size == 0:
+            # Skip any trailers up to the blank line
+            while rfile.readline(1024).strip():
+                pass
+            return
+        yield from read_length(rfile, size)
+        rfile.readline(1024)  # CRLF after each chunk
+
+
+def read_body(rfile, headers):
+    """Yield a request body, chunked or not"""
+    if 'chunked' in headers.get('Transfer-Encoding', '').lower():
+        return read_chunked(rfile)
+    return read_length(rfile, int(headers.get('Content-Length') or 0))
+
+
+class Rejected(Exception):
+    """An upload turned away by admission control"""
+
+    def __init__(self, status, message, retry_after=None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+class TranscriptionServer:
+    """Serves the transcription pipeline over HTTP to many clients.
+
+    Uploads become jobs in a JobQueue under output_dir/server_jobs, worked by
+    server_workers threads that share the tool's backends, cache and warm
+    local model. Each client's transcriptions (and failed recordings) go to
+    output_dir/clients/<name>. Uploads are turned away with a 503 once
+    server_max_queue jobs are waiting or running, and with a 429 once one
+    client has server_max_client_jobs of them.
+    """
+
+    def __init__(self, tool, host=None, port=None):
+        self.tool = tool
+        config = tool.config
+        # Nobody is at this terminal to read transcripts or open files
+        config['auto_open'] = False
+        config['echo_transcripts'] = False
+        self.output_dir = config['output_dir']
+        self.max_queue = config['server_max_queue']
+        self.max_client_jobs = config['server_max_client_jobs']
+        self.max_upload_bytes = int(config['server_max_upload_mb'] * 1024 * 1024)
+        self.jobs = JobQueue(os.path.join(self.output_dir, 'server_jobs'), self.run_job,
+                             workers=config['server_workers'], history=1000)
+        self._reserved = {}  # client -> uploads admitted but not queued yet
+        self._durations = deque(maxlen=50)  # Recent job run times, for Retry-After
+        self._lock = threading.Lock()
+        self._finished = threading.Condition()
+        self.httpd = ThreadingHTTPServer(
+            (host or config['server_host'], config['server_port'] if port is None else port),
+            self._handler()
+        )
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def client_dir(self, client):
+        path = os.path.join(self.output_dir, 'clients', client)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def retry_after(self, waiting):
+        """Rough seconds until a queue slot frees up"""
+        if not self._durations:
+            return 5
+        mean = sum(self._durations) / len(self._durations)
+        return max(1, min(300, round(mean * max(1, waiting - self.max_queue + 1) / self.jobs.workers)))
+
+    def reserve(self, client):
+        """Admit one upload from client or raise Rejected"""
+        with self._lock:
+            active = [job for job in self.jobs.jobs() if job['state'] in ACTIVE_STATES]
+            waiting = len(active) + sum(self._reserved.values())
+            if waiting >= self.max_queue:
+                raise Rejected(503, "Server is busy, try again later", self.retry_after(waiting))
+            mine = sum(1 for job in active if job.get('client') == client) + self._reserved.get(client, 0)
+            if mine >= self.max_client_jobs:
+                raise Rejected(429, f"Client {client} already has {mine} job(s) in progress", self.retry_after(waiting))
+            self._reserved[client] = self._reserved.get(client, 0) + 1
+
+    def release(self, client):
+        with self._lock:
+            self._reserved[client] -= 1
+
+    def receive_audio(self, rfile, headers, params):
+        """Read an upload into a WAV file in the jobs directory and return its path.
+
+        The body is a 16-bit WAV file, or raw 16-bit little-endian PCM with
+        format=pcm (plus rate and channels) in the query string. Chunked
+        bodies are written as they arrive, so a client can stream a live
+        recording.
+        """
+        if int(headers.get('Content-Length') or 0) > self.max_upload_bytes:
+            raise Rejected(413, f"Upload larger than {self.max_upload_bytes // (1024 * 1024)}MB")
+        blocks = read_body(rfile, headers)
+
+        fd, path = tempfile.mkstemp(prefix=UPLOAD_PREFIX, suffix=".wav", dir=self.jobs.jobs_dir)
+        os.close(fd)
+        received = 0
+        try:
+            if params.get('format', 'wav') == 'pcm':
+                channels = int(params.get('channels', 1))
+                sink = WavFileSink(channels, 2, int(params.get('rate', self.tool.config['rate'])), path=path)
+                frame_bytes = channels * 2
+                pending = b''
+                try:
+                    for block in blocks:
+                        received += len(block)
+                        if received > self.max_upload_bytes:
+                            raise Rejected(413, f"Upload larger than {self.max_upload_bytes // (1024 * 1024)}MB")
+                        # Chunks needn't end on a frame boundary
+                        data = pending + block
+                        cut = len(data) - len(data) % frame_bytes
+                        sink.write(data[:cut])
+                        pending = data[cut:]
+                finally:
+                    sink.close()
+            else:
+                with open(path, 'wb') as f:
+                    for block in blocks:
+                        received += len(block)
+                        if received > self.max_upload_bytes:
+                            raise Rejected(413, f"Upload larger than {self.max_upload_bytes // (1024 * 1024)}MB")
+                        f.write(block)
+                try:
+                    with wave.open(path, 'rb') as wf:
+                        sample_width = wf.getsampwidth()
+                except (wave.Error, EOFError):
+                    raise ValueError("Not a WAV file (send raw PCM with format=pcm)")
+                if sample_width != 2:
+                    raise ValueError("Only 16-bit WAV files are supported")
+            if wav_duration(path) == 0:
+                raise ValueError("No audio received")
+            return path
+        except Exception:
+            os.unlink(path)
+            raise
+
+    def submit(self, client, audio_path):
+        """Queue a received upload, turning the client's reservation into a job"""
+        with self._lock:
+            job = self.jobs.submit(audio_path, stop_time=time.time(), client=client,
+                                   audio_seconds=round(wav_duration(audio_path), 3))
+            self._reserved[client] -= 1
+        return job
+
+    def wait(self, job, timeout):
+        """Block until job (as returned by submit) finishes; False on timeout"""
+        deadline = time.monotonic() + timeout
+        with self._finished:
+            while job['state'] not in FINISHED_STATES:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._finished.wait(remaining)
+        return True
+
+    def run_job(self, job, set_state):
+        """Job queue handler: the desktop pipeline, saving into the client's directory"""
+        client = job.get('client') or 'default'
+        output_dir = self.client_dir(client)
+        metrics = RecordingMetrics() if self.tool.metrics_writer else NullMetrics()
+        metrics.set(client=client, audio_seconds=job.get('audio_seconds'))
+        metrics.add_time('queue_wait', max(0.0, time.time() - job['created']))
+        start_time = time.perf_counter()
+        try:
+            saved_file = self.tool.process_audio(
+                job['audio_path'],
+                stop_time=job.get('stop_time'),
+                interactive=False,
+                on_stage=set_state,
+                metrics=metrics,
+                output_dir=output_dir
+            )
+            if saved_file:
+                set_state('done', result_file=os.path.basename(saved_file))
+            elif job['state'] not in FINISHED_STATES:
+                set_state('failed', error="Transcription failed; the recording was kept on the server")
+            return saved_file is not None
+        except Exception as e:
+            logger.error(f"Job {job['id']} for {client} failed: {e}")
+            set_state('failed', error=str(e))
+            return False
+        finally:
+            self._durations.append(time.perf_counter() - start_time)
+            with self._finished:
+                self._finished.notify_all()
+
+    def describe(self, job):
+        """Job details for a client, with the transcript once it is done"""
+        info = {key: job.get(key) for key in ('id', 'client', 'state', 'audio_seconds', 'created', 'updated',
+                                              'error', 'result_file')}
+        if job['state'] == 'done' and job.get('result_file', '').endswith('.md'):
+            try:
+                with open(os.path.join(self.client_dir(info['client']), job['result_file']), 'r',
+                          encoding='utf-8') as f:
+                    info['markdown'] = f.read()
+            except OSError as e:
+                info['error'] = f"Transcript is no longer available: {e}"
+        return info
+
+    def status(self):
+        jobs = self.jobs.jobs()
+        clients = {}
+        for job in jobs:
+            if job['state'] in ACTIVE_STATES:
+                clients[job.get('client')] = clients.get(job.get('client'), 0) + 1
+        return {
+            'workers': self.jobs.workers,
+            'queue_depth': sum(clients.values()),
+            'max_queue': self.max_queue,
+            'states': self.jobs.stats(),
+            'active_clients': clients,
+            'loaded_models': [[*key[:3], dict(key[3])] for key in self.tool.model_manager.loaded_models()],
+            'backend_health': {name: breaker.describe() for name, breaker in self.tool.breakers.items()},
+        }
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            reserved = None  # Client admitted through Expect: 100-continue
+
+            def log_message(self, format, *args):
+                logger.debug(f"{self.address_string()} {format % args}")
+
+            def send_json(self, status, body, retry_after=None):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                if retry_after:
+                    self.send_header('Retry-After', str(retry_after))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def request_client(self, params):
+                return client_name(self.headers.get('X-Client') or params.get('client'))
+
+            def handle_expect_100(self):
+                # Clients that ask first (curl does for large files) are turned away before sending audio
+                url = urlparse(self.path)
+                if url.path == '/transcribe':
+                    client = self.request_client({k: v[-1] for k, v in parse_qs(url.query).items()})
+                    try:
+                        server.reserve(client)
+                    except Rejected as e:
+                        self.close_connection = True
+                        self.send_json(e.status, {'error': str(e)}, e.retry_after)
+                        return False
+                    self.reserved = client
+                return super().handle_expect_100()
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+                if url.path == '/status':
+                    self.send_json(200, server.status())
+                elif url.path.startswith('/jobs/'):
+                    job = server.jobs.job(url.path[len('/jobs/'):])
+                    # Clients only see their own jobs
+                    if job is None or job.get('client') != self.request_client(params):
+                        self.send_json(404, {'error': "Unknown job"})
+                    else:
+                        self.send_json(200, server.describe(job))
+                else:
+                    self.send_json(404, {'error': "Not found"})
+
+            def do_POST(self):
+                url = urlparse(self.path)
+                params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+                if url.path != '/transcribe':
+                    self.close_connection = True  # The body is not read
+                    self.send_json(404, {'error': "Not found"})
+                    return
+
+                client = self.request_client(params)
+                admitted, self.reserved = self.reserved == client, None
+                if not admitted:
+                    try:
+                        server.reserve(client)
+                    except Rejected as e:
+                        # Read the body anyway so the client gets the answer instead of a reset
+                        try:
+                            for _ in read_body(self.rfile, self.headers):
+                                pass
+                        except Exception:
+                            self.close_connection = True
+                        self.send_json(e.status, {'error': str(e)}, e.retry_after)
+                        return
+
+                try:
+                    audio_path = server.receive_audio(self.rfile, self.headers, params)
+                    job = server.submit(client, audio_path)
+                except Rejected as e:
+                    server.release(client)
+                    self.close_connection = True
+                    self.send_json(e.status, {'error': str(e)})
+                    return
+                except Exception as e:
+                    server.release(client)
+                    self.close_connection = True
+                    logger.error(f"Bad upload from {client}: {e}")
+                    self.send_json(400, {'error': f"Could not read audio: {e}"})
+                    return
+
+                logger.info(f"Queued job {job['id']} for {client} ({job['audio_seconds']:.1f}s of audio)")
+                if params.get('wait') in ('1', 'true') and server.wait(job, float(params.get('timeout', 3600))):
+                    self.send_json(200, server.describe(job))
+                else:
+                    self.send_json(202, {'id': job['id'], 'state': job['state'], 'queue_depth': server.jobs.depth()})
+
+        return Handler
+
+    def start(self):
+        """Warm the models, resume queued jobs and start serving in the background"""
+        config = self.tool.config
+        if any(not backend.remote for backend in self.tool.backends):
+            # The first request shouldn't pay for loading the model
+            self.tool.model_manager.preload(
+                config['local_model'],
+                device=config['local_device'],
+                compute_type=config['local_compute_type'],
+                cpu_threads=config['local_cpu_threads'],
+                num_workers=config['local_num_workers']
+            )
+            if config['local_num_workers'] < config['server_workers']:
+                logger.warning(f"local_num_workers ({config['local_num_workers']}) is below server_workers "
+                               f"({config['server_workers']}); local transcriptions will take turns on the model")
+
+        # Uploads cut off by a crash never became jobs
+        for file in os.listdir(self.jobs.jobs_dir):
+            if file.startswith(UPLOAD_PREFIX):
+                os.unlink(os.path.join(self.jobs.jobs_dir, file))
+        resumed = self.jobs.resume()
+        if resumed:
+            print(f"Resuming {resumed} unfinished job(s)")
+        self.jobs.start()
+
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="http-server")
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop accepting uploads; unfinished jobs stay on disk and resume next start"""
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        self.jobs.stop()
+        self.tool.cleanup()
+
+
+def upload(url, client, pcm, rate, realtime=False, chunk_seconds=0.5):
+    """Stream PCM to a server as a chunked upload and wait for the transcript.
+
+    Returns (status, body, retry_after, seconds from the end of the upload to the answer).
+    """
+    parsed = urlparse(url)
+    conn = http.client.HTTPConnection(parsed.hostname, parsed.port, timeout=3600)
+    step = int(chunk_seconds * rate) * 2
+    sent = {}
+
+    def body():
+        for start in range(0, len(pcm), step):
+            if realtime and start:
+                time.sleep(chunk_seconds)
+            yield pcm[start:start + step]
+        sent['at'] = time.perf_counter()
+
+    try:
+        conn.request('POST', f"/transcribe?format=pcm&rate={rate}&channels=1&wait=1", body=body(),
+                     headers={'X-Client': client}, encode_chunked=True)
+        response = conn.getresponse()
+        data = json.loads(response.read() or b'{}')
+        return (response.status, data, response.getheader('Retry-After'),
+                time.perf_counter() - sent.get('at', time.perf_counter()))
+    finally:
+        conn.close()
+
+
+def load_test(args):
+    """Hit a server with simulated clients streaming synthetic speech and report throughput and latency.
+
+    Without --url, a server is started in this process against the fake
+    Whisper API from benchmark.py, in a throwaway working directory.
+    """
+    from benchmark import synthetic_speech, FakeWhisperServer, install_fake_whisper
+
+    server = fake_api = workdir = None
+    url = args.url
+    if url is None:
+        fake_api = FakeWhisperServer(args.api_latency, args.api_rtf).start()
+        workdir = tempfile.mkdtemp(prefix="loadtest_")
+        os.chdir(workdir)
+        config = {'output_dir': 'out', 'server_port': 0, 'preload_local_model': False,
+                  'backends': [{'type': 'api', 'base_url': fake_api.base_url, 'max_upload_mb': 25}, 'local']}
+        config.update(json.loads(args.config) if args.config else {})
+        with open('transcription_config.json', 'w') as f:
+            json.dump(config, f)
+        if args.fake_local:
+            install_fake_whisper()
+            from startup import module_available
+            module_available.cache_clear()
+        server = TranscriptionServer(TranscriptionTool()).start()
+        url = server.url
+
+    rate = 16000
+    results = []
+    lock = threading.Lock()
+
+    def _client(index):
+        pcm = synthetic_speech(args.seconds, rate, seed=index)
+        for _ in range(args.requests):
+            rejected = 0
+            while True:
+                status, body, retry_after, latency = upload(url, f"client{index}", pcm, rate, args.realtime)
+                if status in (429, 503) and rejected < 20:
+                    rejected += 1
+                    time.sleep(float(retry_after or 1))
+                    continue
+                break
+            with lock:
+                results.append({'status': status, 'state': body.get('state'), 'rejected': rejected,
+                                'latency': latency})
+
+    print(f"Load test: {args.clients} client(s) x {args.requests} request(s) of {args.seconds:.0f}s audio "
+          f"against {url}{' (streamed in real time)' if args.realtime else ''}")
+    start_time = time.perf_counter()
+    threads = [threading.Thread(target=_client, args=(i,), daemon=True) for i in range(args.clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall_seconds = time.perf_counter() - start_time
+
+    if server is not None:
+        server.stop()
+        fake_api.stop()
+        os.chdir("/")
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    done = [r for r in results if r['status'] == 200 and r['state'] == 'done']
+    latencies = [r['latency'] for r in done]
+    audio_seconds = len(done) * args.seconds
+    print(f"  completed {len(done)}/{len(results)}, rejected {sum(r['rejected'] for r in results)} time(s) "
+          f"before being admitted")
+    print(f"  wall {wall_seconds:.1f}s for {audio_seconds:.0f}s of audio ({audio_seconds / wall_seconds:.1f}x real time)")
+    if latencies:
+        print(f"  upload-to-transcript latency: p50 {quantile(latencies, 0.5):.2f}s  "
+              f"p95 {quantile(latencies, 0.95):.2f}s  max {max(latencies):.2f}s")
+    return len(done) == len(results)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Headless transcription server for many clients")
+    parser.add_argument("--host", help="Address to listen on (default: server_host from the config)")
+    parser.add_argument("--port", type=int, help="Port (default: server_port from the config)")
+    parser.add_argument("--load-test", action="store_true", help="Run simulated clients instead of serving")
+    parser.add_argument("--url", help="Load test this server instead of one started in-process")
+    parser.add_argument("--clients", type=int, default=8, help="Simulated clients")
+    parser.add_argument("--requests", type=int, default=2, help="Recordings sent by each client, one after another")
+    parser.add_argument("--seconds", type=float, default=30.0, help="Length of each recording")
+    parser.add_argument("--realtime", action="store_true", help="Stream each recording at real-time speed")
+    parser.add_argument("--api-latency", type=float, default=0.5, help="Fake API base latency (s)")
+    parser.add_argument("--api-rtf", type=float, default=0.02, help="Fake API seconds per audio second")
+    parser.add_argument("--fake-local", action="store_true", help="Stub WhisperModel instead of loading faster-whisper")
+    parser.add_argument("--config", help="JSON of config overrides for the in-process server")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.load_test:
+        sys.exit(0 if load_test(args) else 1)
+
+    server = TranscriptionServer(TranscriptionTool(), host=args.host, port=args.port).start()
+    print(f"Transcription server listening on {server.url}")
+    print(f"POST audio to {server.url}/transcribe (X-Client header names your output folder). Ctrl+C to stop.")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print("\nStopping...")
+    finally:
+        server.stop()
@@ -0,0 +1,60 @@
+import time
+import logging
+import importlib
+import importlib.util
+import threading
+from functools import lru_cache
+
+logger = logging.getLogger("startup")
+
+# Modules that are slow to import but not needed to arm the hotkey
+HEAVY_MODULES = ('numpy', 'openai')
+
+
+@lru_cache(maxsize=None)
+def module_available(name):
+    """Check whether a module can be imported, without importing it (cached)"""
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+def warm_imports(names=HEAVY_MODULES):
+    """Import heavy modules on a background thread so first use is fast"""
+    def _warm():
+        for name in names:
+            start_time = time.perf_counter()
+            try:
+                importlib.import_module(name)
+                logger.debug(f"Background import of {name} took {time.perf_counter() - start_time:.3f}s")
+            except ImportError as e:
+                logger.warning(f"Background import of {name} failed: {e}")
+
+    thread = threading.Thread(target=_warm, name="warm-imports")
+    thread.daemon = True
+    thread.start()
+    return thread
+
+
+class StartupTimer:
+    """Records how long each startup stage takes until the hotkey is armed"""
+
+    def __init__(self, start_time=None):
+        self.start_time = start_time if start_time is not None else time.perf_counter()
+        self._last = self.start_time
+        self.stages = []  # (stage, seconds)
+
+    def mark(self, stage):
+        """Close the current stage"""
+        now = time.perf_counter()
+        self.stages.append((stage, now - self._last))
+        self._last = now
+
+    @property
+    def total(self):
+        return self._last - self.start_time
+
+    def summary(self):
+        breakdown = ", ".join(f"{stage} {seconds:.3f}s" for stage, seconds in self.stages)
+        return f"Ready in {self.total:.3f}s ({breakdown})"
@@ -0,0 +1,103 @@
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from audio_sink import PcmAudio
+
+logger = logging.getLogger("streaming")
+
+
+class SegmentingTranscriber:
+    """Cuts a live capture into segments at natural pauses and transcribes them
+    in the background while recording continues.
+
+    feed() is called from the recording thread with every chunk. A segment is
+    closed once it is at least min_seconds long and the speaker has paused for
+    pause_seconds, or unconditionally at max_seconds. finish() closes the last
+    segment, waits for all work and returns the text stitched in order.
+    transcribe_fn is given each segment as a PcmAudio.
+    """
+
+    def __init__(self, transcribe_fn, channels, sample_width, rate,
+                 min_seconds=20.0, max_seconds=120.0, pause_seconds=0.8,
+                 silence_level=500, max_workers=2):
+        self.transcribe_fn = transcribe_fn
+        self.channels = channels
+        self.sample_width = sample_width
+        self.rate = rate
+        self.min_seconds = min_seconds
+        self.max_seconds = max_seconds
+        self.pause_seconds = pause_seconds
+        self.silence_level = silence_level
+        self._frame_bytes = channels * sample_width
+        self._segment = bytearray()
+        self._silent_seconds = 0.0
+        self._futures = []
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="segment")
+
+    @property
+    def segment_count(self):
+        return len(self._futures)
+
+    def _segment_seconds(self):
+        return len(self._segment) / self._frame_bytes / self.rate
+
+    def feed(self, data, level):
+        """Add a captured chunk and its mean level; cut a segment at a pause"""
+        self._segment.extend(data)
+        chunk_seconds = len(data) / self._frame_bytes / self.rate
+        if level < self.silence_level:
+            self._silent_seconds += chunk_seconds
+        else:
+            self._silent_seconds = 0.0
+
+        segment_seconds = self._segment_seconds()
+        at_pause = segment_seconds >= self.min_seconds and self._silent_seconds >= self.pause_seconds
+        if at_pause or segment_seconds >= self.max_seconds:
+            self._cut()
+
+    def _cut(self):
+        """Hand the current segment to the background workers"""
+        if not self._segment:
+            return
+        pcm, self._segment = self._segment, bytearray()  # Hand over the buffer itself, uncopied
+        self._silent_seconds = 0.0
+        index = len(self._futures)
+        logger.info(f"Queued segment {index + 1} ({len(pcm) / self._frame_bytes / self.rate:.1f}s) for transcription")
+        self._futures.append(self._executor.submit(self._transcribe_segment, index, pcm))
+
+    def _transcribe_segment(self, index, pcm):
+        start_time = time.perf_counter()
+        text = self.transcribe_fn(PcmAudio(pcm, self.channels, self.sample_width, self.rate))
+        logger.info(f"Segment {index + 1} transcribed in {time.perf_counter() - start_time:.2f}s")
+        return text
+
+    def finish(self):
+        """Transcribe the last segment and return all text in order.
+
+        Returns None if any segment failed, so the caller can fall back to
+        transcribing the full recording.
+        """
+        self._cut()
+        texts = []
+        failed = False
+        for index, future in enumerate(self._futures):
+            try:
+                text = future.result()
+            except Exception as e:
+                logger.error(f"Segment {index + 1} failed: {e}")
+                text = None
+            if text is None:
+                failed = True
+            elif text.strip():
+                texts.append(text.strip())
+        self._executor.shutdown(wait=False)
+        if failed:
+            return None
+        return " ".join(texts)
+
+    def cancel(self):
+        """Drop pending segments without waiting for them"""
+        for future in self._futures:
+            future.cancel()
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,128 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+
+logger = logging.getLogger("transcript_cache")
+
+
+def pcm_hash(pcm, channels, sample_width, rate):
+    """SHA-256 of the audio format and samples (the same audio hashes the same however it was stored)"""
+    digest = hashlib.sha256(f"{channels}:{sample_width}:{rate}:".encode())
+    digest.update(pcm)
+    return digest.hexdigest()
+
+
+def cache_key(digest, settings):
+    """Key for an audio hash transcribed with the given settings (see transcript_settings)"""
+    return hashlib.sha256((digest + json.dumps(settings, sort_keys=True)).encode()).hexdigest()
+
+
+def transcript_settings(language, backend, upload_codec='wav', upload_bitrate=None):
+    """Everything that shapes the transcript one backend makes of some audio.
+
+    Backends are described by what they run, not by their configured name, so
+    the recorder, the server and quick_transcribe.py find each other's
+    entries. Lossless uploads (WAV, FLAC) send the same samples, so only a
+    lossy codec and its bitrate count.
+    """
+    if backend.remote:
+        settings = {'type': 'api', 'base_url': backend.base_url, 'model': backend.model}
+        if upload_codec not in (None, 'wav', 'flac'):
+            settings['upload'] = [upload_codec, upload_bitrate]
+    else:
+        settings = {'type': 'local', 'model': backend.model, 'device': backend.device,
+                    'compute_type': backend.compute_type, 'beam_size': backend.beam_size}
+    return {'language': language, 'backend': settings}
+
+
+class TranscriptCache:
+    """Transcripts stored by content hash, one JSON file per entry.
+
+    Entries hold the raw transcript, segments (when the backend gives them),
+    the backend used and timings. Reads refresh an entry's mtime, and the
+    least recently used entries are removed once the cache is over max_mb.
+    """
+
+    def __init__(self, cache_dir, max_mb=100):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_mb * 1024 * 1024
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key):
+        """Cached entry for a key, or None"""
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+            os.utime(path)
+            return entry
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.error(f"Unreadable cache entry {key[:12]}, ignoring it: {e}")
+            return None
+
+    def put(self, key, text, segments=None, **fields):
+        """Store a transcript (written atomically) and evict old entries if over budget"""
+        entry = {
+            'key': key,
+            'text': text,
+            'segments': segments,
+            'created': time.time(),
+        }
+        entry.update(fields)
+        path = self._path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, path)
+            self._evict()
+        except Exception as e:
+            logger.error(f"Could not write cache entry: {e}")
+        return entry
+
+    def entries(self):
+        """All entries, most recently used first"""
+        entries = []
+        for file in os.listdir(self.cache_dir):
+            if not file.endswith('.json'):
+                continue
+            path = os.path.join(self.cache_dir, file)
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    entry = json.load(f)
+                entry['used'] = os.path.getmtime(path)
+                entries.append(entry)
+            except Exception:
+                continue
+        return sorted(entries, key=lambda e: e['used'], reverse=True)
+
+    def _evict(self):
+        """Remove least recently used entries until the cache fits in max_bytes"""
+        with self._lock:
+            files = []
+            total = 0
+            with os.scandir(self.cache_dir) as it:
+                for item in it:
+                    if item.name.endswith('.json'):
+                        stat = item.stat()
+                        files.append((stat.st_mtime, stat.st_size, item.path))
+                        total += stat.st_size
+            if total <= self.max_bytes:
+                return
+            for _, size, path in sorted(files):
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                if total <= self.max_bytes:
+                    break
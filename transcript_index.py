@@ -0,0 +1,148 @@
+import os
+import sqlite3
+import logging
+import threading
+
+logger = logging.getLogger("transcript_index")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    name TEXT UNIQUE NOT NULL,
+    mtime REAL NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS files_mtime ON files (mtime);
+"""
+
+
+def is_transcript(name):
+    return name.startswith('transcription_') and name.endswith('.md')
+
+
+class TranscriptIndex:
+    """SQLite index of the transcription markdown files in a directory.
+
+    Text is searchable through FTS5 (or LIKE if this SQLite lacks FTS5).
+    Files are re-read only when their mtime or size changes, and a whole
+    reconcile is skipped when the directory itself hasn't changed.
+    """
+
+    def __init__(self, directory, db_name='index.sqlite3'):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._dir_mtime = None
+        self._db = sqlite3.connect(os.path.join(directory, db_name), check_same_thread=False)
+        # WAL keeps its files open, so writes don't touch the directory mtime we watch
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SCHEMA)
+        try:
+            self._db.execute("CREATE VIRTUAL TABLE IF NOT EXISTS texts USING fts5(body)")
+            self.fts = True
+        except sqlite3.OperationalError:
+            logger.warning("SQLite has no FTS5, falling back to slower LIKE search")
+            self._db.execute("CREATE TABLE IF NOT EXISTS texts (body TEXT)")
+            self.fts = False
+        self._db.commit()
+
+    def _index_file(self, name, mtime, size):
+        """Insert or refresh one file (lock must be held)"""
+        with open(os.path.join(self.directory, name), 'r', encoding='utf-8', errors='replace') as f:
+            body = f.read()
+        row = self._db.execute("SELECT id FROM files WHERE name = ?", (name,)).fetchone()
+        if row:
+            self._db.execute("UPDATE files SET mtime = ?, size = ? WHERE id = ?", (mtime, size, row[0]))
+            self._db.execute("DELETE FROM texts WHERE rowid = ?", (row[0],))
+            file_id = row[0]
+        else:
+            file_id = self._db.execute(
+                "INSERT INTO files (name, mtime, size) VALUES (?, ?, ?)", (name, mtime, size)
+            ).lastrowid
+        self._db.execute("INSERT INTO texts (rowid, body) VALUES (?, ?)", (file_id, body))
+
+    def _remove(self, name):
+        """Drop one file (lock must be held)"""
+        row = self._db.execute("SELECT id FROM files WHERE name = ?", (name,)).fetchone()
+        if row:
+            self._db.execute("DELETE FROM texts WHERE rowid = ?", (row[0],))
+            self._db.execute("DELETE FROM files WHERE id = ?", (row[0],))
+
+    def add(self, path):
+        """Index a file that was just written"""
+        name = os.path.basename(path)
+        stat = os.stat(path)
+        with self._lock:
+            self._index_file(name, stat.st_mtime, stat.st_size)
+            self._db.commit()
+
+    def reconcile(self, force=False):
+        """Bring the index in line with the directory; returns (changed, removed)"""
+        try:
+            dir_mtime = os.stat(self.directory).st_mtime
+        except FileNotFoundError:
+            return 0, 0
+        if not force and dir_mtime == self._dir_mtime:
+            return 0, 0
+
+        with self._lock:
+            known = {name: (mtime, size) for name, mtime, size in self._db.execute("SELECT name, mtime, size FROM files")}
+            changed = 0
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    if not is_transcript(entry.name):
+                        continue
+                    stat = entry.stat()
+                    if known.pop(entry.name, None) != (stat.st_mtime, stat.st_size):
+                        try:
+                            self._index_file(entry.name, stat.st_mtime, stat.st_size)
+                            changed += 1
+                        except OSError as e:
+                            logger.error(f"Could not index {entry.name}: {e}")
+            for name in known:
+                self._remove(name)
+            self._db.commit()
+            self._dir_mtime = dir_mtime
+
+        if changed or known:
+            logger.info(f"Transcript index updated ({changed} new or changed, {len(known)} removed)")
+        return changed, len(known)
+
+    def search(self, words=None, since=None, until=None, limit=20, offset=0):
+        """Transcripts matching all words in [since, until), newest first.
+
+        Returns (rows, total) where rows are (name, mtime, snippet); snippet is
+        None when no words are given.
+        """
+        where, params = [], []
+        if since is not None:
+            where.append("files.mtime >= ?")
+            params.append(since)
+        if until is not None:
+            where.append("files.mtime < ?")
+            params.append(until)
+
+        terms = (words or "").split()
+        if terms and self.fts:
+            where.append("texts MATCH ?")
+            params.append(" ".join('"' + term.replace('"', '""') + '"' for term in terms))
+            snippet = "snippet(texts, 0, '[', ']', '...', 12)"
+        else:
+            for term in terms:
+                where.append("texts.body LIKE ?")
+                params.append(f"%{term}%")
+            snippet = "NULL"
+
+        clause = f"WHERE {' AND '.join(where)}" if where else ""
+        join = "FROM files JOIN texts ON texts.rowid = files.id" if terms else "FROM files"
+        with self._lock:
+            total = self._db.execute(f"SELECT COUNT(*) {join} {clause}", params).fetchone()[0]
+            rows = self._db.execute(
+                f"SELECT files.name, files.mtime, {snippet} {join} {clause} "
+                f"ORDER BY files.mtime DESC LIMIT ? OFFSET ?",
+                params + [limit, offset]
+            ).fetchall()
+        return rows, total
+
+    def close(self):
+        with self._lock:
+            self._db.close()
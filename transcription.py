@@ -1,18 +1,29 @@
-import keyboard
-import pyaudio
-import wave
 import time
+_IMPORT_START = time.perf_counter()
+
+# keyboard, pyaudio, numpy and openai are imported lazily to keep startup fast
 import os
-import numpy as np
 import json
-import tempfile
 import sys
 import subprocess
 from datetime import datetime
 from dotenv import load_dotenv
-from openai import OpenAI
 import logging
 import threading
+from model_manager import get_model_manager
+from audio_sink import create_sink, PcmRing, PcmAudio, as_audio
+from streaming import SegmentingTranscriber
+from capture import CaptureEngine, ProcessCaptureEngine
+from encoding import encode_audio, parse_bitrate
+from job_queue import JobQueue
+from startup import StartupTimer, warm_imports
+from metrics import RecordingMetrics, NullMetrics, MetricsWriter
+from backends import create_backends, TranscriptionCancelled
+from hedging import LatencyTracker, hedged_call
+from circuit_breaker import CircuitBreaker, CLOSED, PROBE
+from transcript_cache import TranscriptCache, pcm_hash, cache_key, transcript_settings
+from transcript_index import TranscriptIndex
+from progressive import ProgressiveWriter
 
 # Set up logging
 logging.basicConfig(
@@ -25,10 +36,16 @@ logger = logging.getLogger("transcription")
 # Load environment variables from .env file
 load_dotenv()
 
+# pyaudio.paInt16, without importing pyaudio at startup
+PA_INT16 = 8
+
+# Recordings being captured into the jobs directory (so queueing one is a rename)
+CAPTURE_PREFIX = "capture_"
+
 class TranscriptionTool:
     # Default configuration
     DEFAULT_CONFIG = {
-        'format': pyaudio.paInt16,
+        'format': PA_INT16,
         'channels': 1,
         'rate': 16000,
         'chunk': 1024,
@@ -36,34 +53,179 @@ class TranscriptionTool:
         'output_dir': 'transcriptions',  # Directory to save transcriptions
         'language': 'en',                # Default language for transcription
         'auto_open': False,              # Auto-open transcription file when done
-        'min_duration': 1.0              # Minimum recording duration in seconds
+        'echo_transcripts': True,        # Print transcripts to the terminal as well as saving them
+        'min_duration': 1.0,             # Minimum recording duration in seconds
+        'capture_mode': 'file',          # 'file' streams to a WAV on disk, 'memory' uses a growable buffer
+        'capture_native': True,          # Open the mic at its own rate/channels and convert to mono at 'rate'
+        'armed_capture': False,          # Keep the mic open between recordings so F8 starts instantly
+        'preroll_seconds': 2.0,          # With armed_capture, audio from before F8 added to the recording
+        'capture_process': False,        # Capture in a separate process that hands audio over through shared memory
+        'capture_ring_seconds': 30.0,    # With capture_process, how far this process may fall behind before audio is lost
+        'streaming': False,              # Transcribe segments in the background while recording
+        'segment_min_seconds': 20.0,     # Shortest segment cut at a pause in streaming mode
+        'segment_max_seconds': 120.0,    # Force a cut after this long without a pause
+        'pause_seconds': 0.8,            # Silence needed to count as a natural pause
+        'silence_level': 500,            # Mean level below which a chunk counts as silence
+        'streaming_workers': 2,          # Segments transcribed in parallel
+        'split_long_recordings': True,   # Split recordings over the upload limit instead of going local
+        'piece_max_mb': 24,              # Size of each piece sent to the API
+        'piece_overlap_seconds': 1.0,    # Audio shared between neighbouring pieces
+        'upload_concurrency': 4,         # Pieces uploaded in parallel
+        'upload_codec': 'wav',           # 'wav', 'flac' (lossless) or 'opus' (lossy speech codec)
+        'upload_bitrate': '24k',         # Bitrate for lossy upload codecs
+        'vad': True,                     # Trim silence before transcribing, skip silent recordings
+        'vad_level': 200,                # Minimum mean level of a speech frame
+        'vad_zero_crossing': False,      # Also use zero-crossing rate to catch quiet fricatives
+        'vad_hangover_seconds': 0.3,     # Keep this much audio after speech ends
+        'vad_max_pause_seconds': 1.0,    # Longer internal pauses are shortened to this
+        'backends': ['api', 'local'],    # Tried in order; entries can also be dicts (see README)
+        'api_base_url': None,            # OpenAI-compatible server to use instead of api.openai.com
+        'api_model': 'whisper-1',        # Model name sent to the API
+        'api_timeout_seconds': 120.0,    # Timeout for each API request
+        'api_retries': 2,                # Retries after timeouts, dropped connections, 429 and 5xx
+        'api_retry_backoff_seconds': 0.5, # Base of the jittered exponential backoff between retries
+        'hedge': False,                  # Start local inference too when the API is slow; first result wins
+        'hedge_after_seconds': 15.0,     # Start the local race after this long without an answer
+        'hedge_adaptive': True,          # Use observed p95 API latency for similar audio once known
+        'breaker': True,                 # Skip a failing or very slow API for a while instead of waiting on it
+        'breaker_window_seconds': 300.0, # Recent requests that count towards the error and slow rates
+        'breaker_min_requests': 3,       # Requests needed in the window before the circuit can open
+        'breaker_error_rate': 0.5,       # Open the circuit when this share of recent requests failed
+        'breaker_slow_seconds': 30.0,    # Requests slower than this (+0.1s per audio second) count as slow
+        'breaker_slow_rate': 0.8,        # Open the circuit when this share of recent requests was slow
+        'breaker_cooldown_seconds': 60.0, # How long to skip the API before probing it again (doubles per failed probe)
+        'cache': True,                   # Reuse transcripts of identical audio (output_dir/cache)
+        'cache_max_mb': 100,             # Least recently used transcripts are evicted beyond this
+        'search_index': True,            # Keep a full-text index of saved transcriptions for search
+        'list_page_size': 20,            # Transcriptions shown per page in the menu
+        'progressive_output': True,      # Write local transcription to the markdown file as segments arrive
+        'segment_timestamps': False,     # Put each segment on its own line with its start time
+        'local_model': 'base',           # faster-whisper model size for local fallback
+        'local_device': 'cpu',           # Use "cuda" if you have GPU
+        'local_compute_type': 'default', # faster-whisper compute type (int8, float32, ...)
+        'local_cpu_threads': 0,          # CPU threads per model worker (0 = CTranslate2 default)
+        'local_num_workers': 1,          # Model workers for concurrent local transcriptions
+        'local_beam_size': 5,            # Beam size (1 is faster, 5 is more accurate)
+        'local_shard_min_seconds': 60.0, # With several workers, longer recordings are split into shards decoded in parallel
+        'preload_local_model': False,    # Load the local model in the background at startup
+        'model_memory_budget_mb': 2048,  # Memory budget for warm local models
+        'background_jobs': True,         # Queue recordings and transcribe them in the background
+        'job_workers': 1,                # Recordings transcribed at the same time
+        'metrics': True,                 # Record per-stage timings for every recording
+        'metrics_file': 'metrics.jsonl', # JSON lines file in output_dir
+        'metrics_prometheus_file': None, # Also keep a Prometheus text file in output_dir (e.g. "metrics.prom")
+        'server_host': '127.0.0.1',      # server.py: address to listen on ("0.0.0.0" for other machines)
+        'server_port': 8765,             # server.py: HTTP port
+        'server_workers': 2,             # server.py: recordings transcribed at the same time
+        'server_max_queue': 32,          # server.py: jobs waiting or running before new uploads get a 503
+        'server_max_client_jobs': 4,     # server.py: jobs one client may have queued before getting a 429
+        'server_max_upload_mb': 500      # server.py: largest accepted upload
     }
     
     def __init__(self):
+        self.startup = StartupTimer(_IMPORT_START)
+        self.startup.mark('imports')
+        
         # Initialize configuration
         self.config = self.DEFAULT_CONFIG.copy()
         self.load_config()
         
-        # Initialize OpenAI client
-        self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-        if not os.getenv("OPENAI_API_KEY"):
-            logger.error("OpenAI API key not found! Please add it to your .env file.")
-            sys.exit(1)
+        # Import numpy/openai in the background while we finish starting up
+        warm_imports()
         
         # Initialize state variables
         self.recording = False
         self.preferred_device_id = None
-        self.frames = []  # Store all audio frames
-        self.recording_thread = None
+        self.sink = None  # Where captured audio is written (WAV file or PCM buffer)
+        self.capture = None  # Open mic (CaptureEngine), delivering to on_capture
+        self.capture_rate = None  # Sample rate the mic was opened at
+        self.capture_channels = None
+        self.channels = self.config['channels']  # Channels kept after conversion
+        self.capture_live = False  # Audio goes to the recording rather than the pre-roll
+        self.preroll = None  # Armed mode: the last few seconds before F8
+        self.start_requested = None  # When F8 was pressed, until the first audio arrives
+        self._capture_lock = threading.Lock()
+        self.segmenter = None  # Background segment transcription in streaming mode
+        self.stop_time = None  # When the current recording was stopped
+        self.metrics = None  # Measurements for the current recording
+        self.capture_start = None
         self.status_thread = None
-        self.audio_levels = []  # Store audio levels for display
+        self.audio_level = 0.0  # Mean level of the latest captured batch, for display
+        self._path_lock = threading.Lock()  # Transcription file names are claimed one at a time
         
         # Create output directory if it doesn't exist
         os.makedirs(self.config['output_dir'], exist_ok=True)
         
+        # Background job queue (jobs persisted under output_dir/jobs)
+        self.job_queue = None
+        if self.config['background_jobs']:
+            self.job_queue = JobQueue(
+                os.path.join(self.config['output_dir'], 'jobs'),
+                self.run_job,
+                workers=self.config['job_workers']
+            )
+        
+        # Transcripts by audio content, so re-processing the same audio is free
+        self.cache = None
+        if self.config['cache']:
+            self.cache = TranscriptCache(os.path.join(self.config['output_dir'], 'cache'), self.config['cache_max_mb'])
+        
+        # Full-text index of saved transcriptions (reconciled with the folder in run())
+        self.index = None
+        if self.config['search_index']:
+            try:
+                self.index = TranscriptIndex(self.config['output_dir'])
+            except Exception as e:
+                logger.error(f"Could not open the transcript index, search is disabled: {e}")
+        
+        # Per-recording metrics export
+        self.metrics_writer = None
+        if self.config['metrics']:
+            prometheus_file = self.config['metrics_prometheus_file']
+            self.metrics_writer = MetricsWriter(
+                os.path.join(self.config['output_dir'], self.config['metrics_file']),
+                os.path.join(self.config['output_dir'], prometheus_file) if prometheus_file else None
+            )
+        
         # Audio processing resources
         self.pyaudio_instance = None
-        self.stream = None
+        
+        # Shared local model cache (warm across fallbacks)
+        self.model_manager = get_model_manager(self.config['model_memory_budget_mb'])
+        if self.config['preload_local_model']:
+            self.model_manager.preload(
+                self.config['local_model'],
+                device=self.config['local_device'],
+                compute_type=self.config['local_compute_type'],
+                cpu_threads=self.config['local_cpu_threads'],
+                num_workers=self.config['local_num_workers']
+            )
+        
+        # Transcription backends, tried in order (API clients are created on first use)
+        self.backends = create_backends(self.config, self.model_manager)
+        self.latency = LatencyTracker()  # Remote request latencies, for adaptive hedging
+        self.breakers = {}  # Remote backend name -> CircuitBreaker
+        if self.config['breaker']:
+            for backend in self.backends:
+                if backend.remote:
+                    self.breakers[backend.name] = CircuitBreaker(
+                        backend.name,
+                        window_seconds=self.config['breaker_window_seconds'],
+                        min_requests=self.config['breaker_min_requests'],
+                        error_rate=self.config['breaker_error_rate'],
+                        slow_seconds=self.config['breaker_slow_seconds'],
+                        slow_rate=self.config['breaker_slow_rate'],
+                        cooldown_seconds=self.config['breaker_cooldown_seconds'],
+                        max_cooldown_seconds=self.config['breaker_cooldown_seconds'] * 10
+                    )
+        if any(backend.remote and not backend.api_key for backend in self.backends):
+            logger.error("OpenAI API key not found! Please add it to your .env file.")
+            sys.exit(1)
+        if not self.backends:
+            logger.error("No transcription backends configured. Check 'backends' in transcription_config.json.")
+            sys.exit(1)
+        
+        self.startup.mark('init')
     
     def load_config(self):
         """Load configuration from file if it exists"""
@@ -109,22 +271,23 @@ class TranscriptionTool:
         while self.recording:
             dots = (dots % max_dots) + 1
             
-            # Get the current audio level (or use 0 if no recent levels)
-            current_level = 0
-            if self.audio_levels:
-                current_level = self.audio_levels[-1]
-            
             # Create status line with both recording indicator and audio level
             rec_status = f"RECORDING{'.' * dots}{' ' * (max_dots - dots)}"
-            level_display = self.show_audio_level(current_level)
+            level_display = self.show_audio_level(self.audio_level)
             status = f"\r{rec_status} {level_display}"
+            capture = self.capture
+            if capture and capture.overflows:
+                status += f"  {capture.overflows} buffers lost"
+            offline = [name for name, breaker in self.breakers.items() if breaker.state != CLOSED]
+            if offline:
+                status += f"  ({', '.join(offline)} offline, using fallback)"
             
             # Clear line and print status
             print(status, end="", flush=True)
             time.sleep(update_interval)
         
         # Clear status line when done
-        print("\r" + " " * 60 + "\r", end="", flush=True)
+        print("\r" + " " * 80 + "\r", end="", flush=True)
     
     def start_recording(self):
         """Start audio recording"""
@@ -132,33 +295,65 @@ class TranscriptionTool:
             return
         
         self.recording = True
-        self.frames = []  # Reset frames
-        self.audio_levels = []  # Reset audio levels
+        self.audio_level = 0.0
+        self.metrics = RecordingMetrics() if self.metrics_writer else NullMetrics()
         
         print("\n" + "=" * 60)
         print("RECORDING STARTED")
         print("=" * 60)
         logger.info("Recording started...")
         
-        # Initialize PyAudio if needed
-        if not self.pyaudio_instance:
-            self.pyaudio_instance = pyaudio.PyAudio()
+        self.start_requested = time.perf_counter()
+        armed = self.armed
+        
+        import pyaudio
         
         # Open audio stream
         try:
-            self.stream = self.pyaudio_instance.open(
-                format=self.config['format'],
-                channels=self.config['channels'],
-                rate=self.config['rate'],
-                input=True,
-                input_device_index=self.preferred_device_id,
-                frames_per_buffer=self.config['chunk']
+            # An armed mic is already open; otherwise open it now (and start it once the sink is ready)
+            if not armed:
+                self.open_capture()
+            self.capture.reset_stats()
+            self.metrics.set(capture_rate=self.capture_rate, capture_channels=self.capture_channels)
+            
+            self.sink = create_sink(
+                self.config['capture_mode'],
+                self.channels,
+                pyaudio.get_sample_size(self.config['format']),
+                self.config['rate'],
+                directory=self.job_queue.jobs_dir if self.job_queue else None,
+                prefix=CAPTURE_PREFIX
             )
             
-            # Start the recording thread
-            self.recording_thread = threading.Thread(target=self.record_audio)
-            self.recording_thread.daemon = True
-            self.recording_thread.start()
+            if self.config['streaming']:
+                metrics = self.metrics
+                self.segmenter = SegmentingTranscriber(
+                    lambda audio: self.transcribe_segment(audio, metrics),
+                    self.channels,
+                    pyaudio.get_sample_size(self.config['format']),
+                    self.config['rate'],
+                    min_seconds=self.config['segment_min_seconds'],
+                    max_seconds=self.config['segment_max_seconds'],
+                    pause_seconds=self.config['pause_seconds'],
+                    silence_level=self.config['silence_level'],
+                    max_workers=self.config['streaming_workers']
+                )
+            
+            if armed:
+                # Start with the audio from just before F8; the capture thread carries on from there
+                with self._capture_lock:
+                    preroll = self.preroll.read()
+                    self.preroll.clear()
+                    if preroll:
+                        self.store_audio(preroll)
+                    preroll_seconds = self.sink.duration
+                    self.capture_start = time.perf_counter() - preroll_seconds
+                    self.capture_live = True
+                self.metrics.set(preroll_seconds=round(preroll_seconds, 3))
+            else:
+                self.capture_live = True
+                self.capture_start = time.perf_counter()
+                self.capture.start()
             
             # Start the status thread
             self.status_thread = threading.Thread(target=self.show_status)
@@ -167,45 +362,188 @@ class TranscriptionTool:
             
         except Exception as e:
             self.recording = False
+            self.capture_live = False
+            if not armed:
+                self.close_capture()
+            if self.sink:
+                self.sink.discard()
+                self.sink = None
+            if self.segmenter:
+                self.segmenter.cancel()
+                self.segmenter = None
             logger.error(f"Failed to start recording: {e}")
             print(f"ERROR: Failed to start recording: {e}")
     
+    def open_capture(self):
+        """Open the mic (with a converter when its format isn't the one we keep); call capture.start() to run it"""
+        import pyaudio
+        
+        # Initialize PyAudio if needed
+        if not self.pyaudio_instance:
+            self.pyaudio_instance = pyaudio.PyAudio()
+        # Left over from an armed capture that stopped with an error
+        self.close_capture()
+        
+        # The mic runs in its own format; what we keep is mono at the configured rate
+        self.capture_rate, self.capture_channels = self.capture_format()
+        self.channels = self.config['channels']
+        converter = None
+        if self.config['capture_native']:
+            from resample import StreamingResampler
+            self.channels = 1
+            if (self.capture_rate, self.capture_channels) != (self.config['rate'], 1):
+                converter = StreamingResampler(self.capture_rate, self.capture_channels, self.config['rate'])
+                logger.info(f"Converting {self.capture_rate} Hz/{self.capture_channels}ch capture to "
+                            f"{self.config['rate']} Hz mono")
+        
+        if self.config['capture_process']:
+            # The capture process builds its own converter; we only read the converted audio
+            sample_width = pyaudio.get_sample_size(self.config['format'])
+            self.capture = ProcessCaptureEngine(
+                self.on_capture,
+                format=self.config['format'],
+                rate=self.capture_rate,
+                channels=self.capture_channels,
+                chunk=self.config['chunk'],
+                device_index=self.preferred_device_id,
+                out_rate=self.config['rate'] if converter else None,
+                ring_bytes=int(self.config['capture_ring_seconds'] * self.config['rate']) * self.channels * sample_width,
+                frame_bytes=self.channels * sample_width
+            )
+            return
+        self.capture = CaptureEngine(
+            self.pyaudio_instance,
+            self.on_capture,
+            format=self.config['format'],
+            rate=self.capture_rate,
+            channels=self.capture_channels,
+            chunk=self.config['chunk'],
+            device_index=self.preferred_device_id,
+            converter=converter
+        )
+    
+    def close_capture(self):
+        """Stop and close the mic, delivering the audio still queued"""
+        if self.capture is None:
+            return
+        try:
+            self.capture.close()
+        except Exception as e:
+            logger.error(f"Error closing audio stream: {e}")
+            print(f"Error closing audio stream: {e}")
+        self.capture = None
+    
+    @property
+    def armed(self):
+        return self.preroll is not None and self.capture is not None and self.capture.alive
+    
+    def arm_capture(self):
+        """Keep the mic open between recordings, holding the last few seconds for pre-roll"""
+        import pyaudio
+        
+        try:
+            self.open_capture()
+            self.preroll = PcmRing(self.config['preroll_seconds'], self.channels,
+                                   pyaudio.get_sample_size(self.config['format']), self.config['rate'])
+            self.capture.start()
+        except Exception as e:
+            logger.error(f"Could not arm the mic, it will be opened on each F8 instead: {e}")
+            self.close_capture()
+            self.preroll = None
+            return False
+        logger.info(f"Mic armed with {self.config['preroll_seconds']:.1f}s of pre-roll")
+        return True
+    
+    def on_capture(self, data):
+        """Capture engine consumer: converted audio goes to the recording, or to the pre-roll between recordings"""
+        with self._capture_lock:
+            if self.capture_live:
+                self.store_audio(data)
+                self.note_first_sample()
+            elif self.preroll is not None:
+                self.preroll.write(data)
+    
+    def note_first_sample(self):
+        """Record how long after F8 the first live audio reached the recording"""
+        if self.start_requested is not None:
+            latency = time.perf_counter() - self.start_requested
+            self.start_requested = None
+            self.metrics.set(hotkey_to_first_sample_seconds=round(latency, 4))
+            logger.info(f"Hotkey-to-first-sample latency: {latency * 1000:.0f} ms")
+    
+    def capture_format(self):
+        """(rate, channels) to open the mic with: its native format, or the configured one"""
+        if self.config['capture_native']:
+            try:
+                if self.preferred_device_id is None:
+                    info = self.pyaudio_instance.get_default_input_device_info()
+                else:
+                    info = self.pyaudio_instance.get_device_info_by_index(self.preferred_device_id)
+                # Anything past stereo is usually an interface's unused inputs
+                return int(info['defaultSampleRate']), max(1, min(2, int(info['maxInputChannels'])))
+            except Exception as e:
+                logger.warning(f"Could not read the mic's native format, using the configured one: {e}")
+        return self.config['rate'], self.config['channels']
+    
     def stop_recording(self):
         """Stop audio recording and process the full recording"""
         if not self.recording:
             return
         
         self.recording = False
+        self.stop_time = time.time()
+        capture_seconds = time.perf_counter() - self.capture_start if self.capture_start else 0.0
+        
+        # Take in the audio captured up to now; an armed mic then goes back to filling the pre-roll,
+        # any other is closed (delivering what is still queued first)
+        capture = self.capture
+        if self.armed:
+            capture.catch_up()
+        else:
+            self.close_capture()
+        with self._capture_lock:
+            self.capture_live = False
         print("\n" + "=" * 60)
         print("RECORDING STOPPED")
         print("=" * 60)
         
-        # Calculate recording duration
-        recording_duration = len(self.frames) * (self.config['chunk'] / self.config['rate'])
-        logger.info(f"Recording stopped. Duration: {recording_duration:.2f} seconds ({len(self.frames)} frames)")
-        
-        # Wait for recording thread to finish
-        if self.recording_thread and self.recording_thread.is_alive():
-            self.recording_thread.join(timeout=1.0)
-        
         # Wait for status thread to finish
         if self.status_thread and self.status_thread.is_alive():
             self.status_thread.join(timeout=1.0)
         
-        # Close audio stream
-        if self.stream:
-            try:
-                self.stream.stop_stream()
-                self.stream.close()
-                self.stream = None
-            except Exception as e:
-                logger.error(f"Error closing audio stream: {e}")
-                print(f"Error closing audio stream: {e}")
+        # Finalize the captured audio
+        if not self.sink:
+            return
+        with self.metrics.stage('wav_write'):
+            self.sink.close()
+        
+        # Calculate recording duration
+        recording_duration = self.sink.duration
+        logger.info(f"Recording stopped. Duration: {recording_duration:.2f} seconds ({self.sink.frames_written} frames)")
+        
+        # Overflows are the buffers PortAudio reported lost; dropped_frames compares
+        # wall-clock time with the captured frames, which also catches anything else
+        dropped_frames = max(0, int(capture_seconds * self.sink.rate) - self.sink.frames_written)
+        overflows = capture.overflows if capture else 0
+        self.metrics.add_time('capture', capture_seconds)
+        self.metrics.set(
+            audio_seconds=round(recording_duration, 3),
+            audio_bytes=self.sink.bytes_written,
+            dropped_frames=dropped_frames,
+            overflow_count=overflows,
+            capture_backlog_peak=capture.backlog_peak if capture else 0
+        )
+        if overflows:
+            lost = overflows * self.config['chunk'] / self.capture_rate
+            logger.warning(f"{overflows} audio buffers overflowed during the recording (about {lost:.2f}s lost)")
+            print(f"WARNING: The mic overflowed {overflows} times; about {lost:.2f}s of audio may be missing")
         
         # Process the entire recording
-        if not self.frames:
+        if not self.sink.frames_written:
             logger.warning("No audio was recorded!")
             print("WARNING: No audio was recorded!")
+            self.sink.discard()
+            self._cancel_segmenter()
             return
             
         # Check if recording is too short
@@ -213,187 +551,661 @@ class TranscriptionTool:
             logger.warning(f"Recording too short ({recording_duration:.2f}s). Minimum duration: {self.config['min_duration']}s")
             print(f"WARNING: Recording too short ({recording_duration:.2f}s). Minimum duration: {self.config['min_duration']}s")
             print("The recording was not processed.")
+            self.sink.discard()
+            self._cancel_segmenter()
             return
             
-        print("\nProcessing the recording...\n")
-        self.process_recording()
+        if self.job_queue is not None:
+            self.enqueue_recording()
+        else:
+            print("\nProcessing the recording...\n")
+            self.process_recording()
     
-    def record_audio(self):
-        """Record audio and store all frames"""
+    def _cancel_segmenter(self):
+        """Drop any background segment work for a discarded recording"""
+        if self.segmenter:
+            self.segmenter.cancel()
+            self.segmenter = None
+    
+    def store_audio(self, data):
+        """Write a batch of converted audio to the sink, level meter and segmenter"""
+        import numpy as np
+        
+        self.sink.write(data)
+        
+        # One level per batch, for the meter and the segmenter's pause detection
+        audio_level = float(np.abs(np.frombuffer(data, dtype=np.int16)).mean())
+        self.audio_level = audio_level
+        
+        # Cut and queue a segment at natural pauses in streaming mode
+        if self.segmenter:
+            self.segmenter.feed(data, audio_level)
+    
+    def trim_recording(self, audio, verbose=True, metrics=None):
+        """Trim silence with VAD; returns (PcmAudio to transcribe, has_speech).
+        
+        The trimmed audio stays in memory; it is only written out if a remote
+        backend needs an upload.
+        """
+        audio = as_audio(audio)
+        if not self.config['vad']:
+            return audio, True
+        metrics = metrics or NullMetrics()
+        
         try:
-            while self.recording and self.stream:
-                try:
-                    data = self.stream.read(self.config['chunk'], exception_on_overflow=False)
-                    self.frames.append(data)
-                    
-                    # Calculate and store audio level for display
-                    audio_array = np.frombuffer(data, dtype=np.int16)
-                    audio_level = np.abs(audio_array).mean()
-                    self.audio_levels.append(audio_level)
-                    
-                    # Keep only the last few audio levels to avoid memory bloat
-                    if len(self.audio_levels) > 10:
-                        self.audio_levels = self.audio_levels[-10:]
-                        
-                except Exception as e:
-                    logger.error(f"Error during recording: {e}")
-                    print(f"Error during recording: {e}")
-                    break
+            from vad import trim_pcm
+            with metrics.stage('vad'):
+                trimmed, stats = trim_pcm(
+                    audio.pcm, audio.channels, audio.sample_width, audio.rate,
+                    level=self.config['vad_level'],
+                    use_zcr=self.config['vad_zero_crossing'],
+                    hangover_seconds=self.config['vad_hangover_seconds'],
+                    max_pause_seconds=self.config['vad_max_pause_seconds']
+                )
         except Exception as e:
-            logger.error(f"Recording thread error: {e}")
-            print(f"Recording thread error: {e}")
+            logger.error(f"Voice activity detection failed, using untrimmed audio: {e}")
+            return audio, True
+        
+        if trimmed is None:
+            logger.info(f"No speech detected in {stats['original_seconds']:.1f}s of audio")
+            return None, False
+        
+        metrics.add('vad_removed_seconds', round(stats['removed_seconds'], 3))
+        logger.info(f"VAD removed {stats['removed_seconds']:.1f}s of {stats['original_seconds']:.1f}s")
+        if verbose and stats['removed_seconds'] >= 1.0:
+            print(f"Trimmed {stats['removed_seconds']:.1f}s of silence ({stats['kept_seconds']:.1f}s left to transcribe)")
+        if stats['removed_seconds'] < 0.5:
+            return audio, True  # Not worth a second copy of the audio
+        return PcmAudio(trimmed, audio.channels, audio.sample_width, audio.rate), True
     
-    def transcribe_locally(self, audio_file_path):
-        """Fallback local transcription using faster-whisper"""
+    def transcribe_segment(self, segment, metrics=None):
+        """Transcribe one streamed segment quietly; silent segments give empty text"""
+        audio, has_speech = self.trim_recording(segment, verbose=False, metrics=metrics)
+        if not has_speech:
+            return ""
         try:
-            print("Attempting local transcription with faster-whisper...")
-            
-            # Check if faster-whisper is installed
-            result = subprocess.run([sys.executable, '-c', 'import faster_whisper'], 
-                                  capture_output=True, text=True)
-            
-            if result.returncode != 0:
-                print("Installing faster-whisper...")
-                subprocess.check_call([sys.executable, '-m', 'pip', 'install', 'faster-whisper'])
-            
-            # Import after ensuring it's installed
-            from faster_whisper import WhisperModel
-            
-            # Initialize local model (downloads on first use)
-            model = WhisperModel("base", device="cpu")  # Use "cuda" if you have GPU
-            
-            segments, info = model.transcribe(audio_file_path, language=self.config['language'])
-            
-            # Combine all segments
-            transcription = " ".join([segment.text for segment in segments])
+            return self.transcribe_file(audio, verbose=False, metrics=metrics)
+        finally:
+            audio.discard()  # Any WAV written for an upload
+    
+    def cache_keys(self, audio):
+        """Cache key of this audio for each backend, in the order they are tried"""
+        digest = pcm_hash(audio.pcm, audio.channels, audio.sample_width, audio.rate)
+        codec, bitrate = self.config['upload_codec'], parse_bitrate(self.config['upload_bitrate'])
+        return {backend.name: cache_key(digest, transcript_settings(self.config['language'], backend, codec, bitrate))
+                for backend in self.backends}
+    
+    def transcribe_file(self, audio, verbose=True, on_stage=None, metrics=None, on_segment=None):
+        """Transcribe a WAV file or PcmAudio, reusing the cached transcript of identical audio.
+        
+        on_segment is called with each segment as a local backend decodes it.
+        """
+        audio = as_audio(audio)
+        metrics = metrics or NullMetrics()
+        details = {'backend': None, 'segments': [], 'on_segment': on_segment}
+        if self.cache is None:
+            return self.transcribe_with_backends(audio, verbose, on_stage, metrics, details)
+        
+        # Any backend's transcript of this audio will do, the preferred ones first
+        try:
+            with metrics.stage('cache_lookup'):
+                keys = self.cache_keys(audio)
+                entry = None
+                for key in keys.values():
+                    entry = self.cache.get(key)
+                    if entry is not None:
+                        break
+        except Exception as e:
+            logger.error(f"Transcript cache lookup failed: {e}")
+            return self.transcribe_with_backends(audio, verbose, on_stage, metrics, details)
+        
+        if entry is not None:
+            metrics.add_backend('cache')
+            logger.info(f"Cache hit {key[:12]} (transcribed by {entry.get('backend')})")
+            if verbose:
+                print("Using the cached transcription of this audio")
+            return entry['text']
+        
+        start_time = time.perf_counter()
+        text = self.transcribe_with_backends(audio, verbose, on_stage, metrics, details)
+        # Text merged from pieces has no single backend; the pieces are cached one by one
+        if text is not None and details['backend'] in keys:
+            self.cache.put(
+                keys[details['backend']], text, details['segments'] or None,
+                backend=details['backend'],
+                language=self.config['language'],
+                audio_seconds=round(audio.duration, 3),
+                transcribe_seconds=round(time.perf_counter() - start_time, 3)
+            )
+        return text
+    
+    def transcribe_with_backends(self, audio, verbose=True, on_stage=None, metrics=None, details=None):
+        """Transcribe a WAV file or PcmAudio with the configured backends, falling through them in order.
+        
+        details, if given, receives the backend that produced the text and its
+        segments, and may hold an on_segment callback for live output. Local
+        backends take the audio from memory; the upload for remote ones is only
+        written and encoded once one is actually tried.
+        """
+        audio = as_audio(audio)
+        metrics = metrics or NullMetrics()
+        details = details if details is not None else {'backend': None, 'segments': []}
+        
+        def on_segment(segment):
+            details['segments'].append(segment)
+            if details.get('on_segment'):
+                details['on_segment'](segment)
+        
+        upload = {}
+        
+        def upload_path():
+            """Write and compress the upload the first time a remote backend needs it"""
+            if not upload:
+                if on_stage:
+                    on_stage('encoding')
+                with metrics.stage('wav_write'):
+                    wav_path = audio.wav_path()
+                upload['path'], encode_seconds = encode_audio(
+                    wav_path, self.config['upload_codec'], parse_bitrate(self.config['upload_bitrate'])
+                )
+                metrics.add_time('encode', encode_seconds)
+                upload['wav_size'] = os.path.getsize(wav_path)
+                upload['size'] = os.path.getsize(upload['path'])
+                if on_stage:
+                    on_stage('transcribing')
+            return upload['path']
+        
+        # A losing hedged request may still be sending the upload after we return, so
+        # the upload goes once this call and every such request are done with it
+        upload_lock = threading.Lock()
+        upload_users = [1]
+        
+        def release_upload():
+            with upload_lock:
+                upload_users[0] -= 1
+                if upload_users[0]:
+                    return
+            if upload and upload['path'] != audio.path and os.path.exists(upload['path']):
+                try:
+                    os.unlink(upload['path'])
+                except OSError as e:
+                    logger.error(f"Error deleting upload file: {e}")
+        
+        def hedge_upload():
+            """The upload for a hedged request: a file of our own, not the caller's WAV"""
+            if upload['path'] == audio.path:
+                import shutil
+                import tempfile
+                fd, path = tempfile.mkstemp(suffix=os.path.splitext(audio.path)[1])
+                os.close(fd)
+                shutil.copyfile(audio.path, path)
+                upload['path'] = path
+            with upload_lock:
+                upload_users[0] += 1
+            return upload['path']
+        
+        try:
+            if on_stage:
+                on_stage('transcribing')
             
-            logger.info("Local transcription completed successfully")
-            return transcription
+            audio_seconds = audio.duration
+            tried = []
+            for index, backend in enumerate(self.backends):
+                if backend in tried:
+                    continue
+                tried.append(backend)
+                
+                # An open circuit sends the recording straight on, unless nothing is left to try
+                breaker = self.breakers.get(backend.name)
+                admission = breaker.admit() if breaker else CLOSED
+                if admission is None:
+                    if any(other not in tried for other in self.backends[index + 1:]):
+                        metrics.add('breaker_skips', 1)
+                        logger.info(f"Skipping {backend.name}: {breaker.describe()}")
+                        if verbose:
+                            print(f"Skipping {backend.name} ({breaker.describe()})")
+                        continue
+                    admission = CLOSED
+                
+                # Remote backends get the encoded upload, local ones the audio in memory
+                source = audio
+                if backend.remote:
+                    source = upload_path()
+                    file_size = upload['size']
+                    if backend.max_upload_bytes and file_size > backend.max_upload_bytes:
+                        if verbose:
+                            print(f"WARNING: File size ({file_size / 1024 / 1024:.1f}MB) exceeds the {backend.name} upload limit "
+                                  f"({backend.max_upload_bytes / 1024 / 1024:.0f}MB)")
+                        if self.config['split_long_recordings']:
+                            return self.transcribe_in_pieces(audio.wav_path(), verbose, compression=upload['wav_size'] / file_size,
+                                                             metrics=metrics)
+                        continue
+                
+                # Race a slow remote backend against the next local one; a probe of a
+                # half-open circuit races it from the start, so the probe costs no waiting
+                probe = admission == PROBE
+                hedge = self.hedge_backend(index, probe) if backend.remote else None
+                
+                logger.info(f"Transcribing with the {backend.name} backend{' (probe)' if probe else ''}...")
+                if verbose:
+                    print(f"Transcribing with {backend.name}...")
+                try:
+                    request_start = time.perf_counter()
+                    if hedge:
+                        tried.append(hedge)
+                        source = hedge_upload()
+                        backend, text = self.transcribe_hedged(backend, source, hedge, audio, audio_seconds,
+                                                               metrics, details['segments'], probe=probe,
+                                                               on_settled=release_upload)
+                    else:
+                        try:
+                            text = backend.transcribe(source, self.config['language'], metrics, on_segment=on_segment)
+                        except Exception as e:
+                            self.record_health(backend, audio_seconds, error=e)
+                            raise
+                        self.record_health(backend, audio_seconds, time.perf_counter() - request_start)
+                except Exception as e:
+                    del details['segments'][:]
+                    metrics.add('api_errors' if backend.remote else 'local_errors', 1)
+                    logger.error(f"{backend.name} backend failed: {e}")
+                    if verbose:
+                        print(f"{backend.name} transcription failed: {e}")
+                    continue
+                
+                metrics.add_backend(backend.name)
+                details['backend'] = backend.name
+                if backend.remote:
+                    if not hedge:
+                        self.latency.record(backend.name, audio_seconds, time.perf_counter() - request_start)
+                    logger.info(
+                        f"Upload report: {os.path.splitext(upload['path'])[1][1:]} "
+                        f"{upload['wav_size'] / 1024:.0f}KB -> {upload['size'] / 1024:.0f}KB "
+                        f"({upload['wav_size'] / max(upload['size'], 1):.1f}x smaller), "
+                        f"upload+transcribe {time.perf_counter() - request_start:.2f}s"
+                    )
+                return text
             
-        except Exception as e:
-            logger.error(f"Local transcription failed: {e}")
-            print(f"Local transcription failed: {e}")
+            logger.error("All transcription backends failed")
+            return None
+        
+        finally:
+            # Drop the encoded copy (now, or once hedged requests finish); the caller owns the audio
+            release_upload()
+    
+    def hedge_backend(self, index, probe=False):
+        """The local backend to race against remote backend `index`, if hedging is on
+        (or the request is a circuit breaker probe)"""
+        if not (self.config['hedge'] or probe):
             return None
+        for backend in self.backends[index + 1:]:
+            if not backend.remote:
+                return backend
+        return None
+    
+    def hedge_delay(self, backend, audio_seconds):
+        """How long to wait for a remote backend before starting the local race"""
+        if self.config['hedge_adaptive']:
+            p95 = self.latency.p95(backend.name, audio_seconds)
+            if p95 is not None:
+                return p95
+        return self.config['hedge_after_seconds']
+    
+    def transcribe_hedged(self, backend, upload_path, local, audio, audio_seconds, metrics, segments, probe=False,
+                          on_settled=None):
+        """Run a remote backend, starting local inference in parallel if it is slow or fails.
+        
+        Returns (winning backend, text); the loser is cancelled. Local segments
+        are collected into segments, which is emptied if the remote backend wins.
+        A circuit breaker probe starts both at once and lets its single request
+        run to completion even if local wins, so the breaker learns the outcome.
+        It is not retried, so one probe is one request.
+        """
+        delay = 0.0 if probe else self.hedge_delay(backend, audio_seconds)
+        language = self.config['language']
+        
+        def remote(cancel):
+            # Recorded even when local wins, so slow answers still count towards the p95 and the breaker
+            start_time = time.perf_counter()
+            try:
+                if probe:
+                    text = backend.transcribe(upload_path, language, metrics, retries=0)
+                else:
+                    text = backend.transcribe(upload_path, language, metrics, cancel)
+            except Exception as e:
+                if probe and isinstance(e, FileNotFoundError):
+                    raise  # Local won before the probe got going; the breaker sends another probe later
+                self.record_health(backend, audio_seconds, error=e)
+                raise
+            elapsed = time.perf_counter() - start_time
+            self.latency.record(backend.name, audio_seconds, elapsed)
+            self.record_health(backend, audio_seconds, elapsed)
+            return text
+        
+        index, text = hedged_call(
+            remote,
+            lambda cancel: local.transcribe(audio, language, metrics, cancel, on_segment=segments.append),
+            delay,
+            on_settled
+        )
+        if index == 0:
+            del segments[:]
+        else:
+            metrics.add('hedge_wins', 1)
+            logger.info(f"{local.name} beat {backend.name} (hedged after {delay:.1f}s)")
+        return (backend, local)[index], text
+    
+    def record_health(self, backend, audio_seconds, seconds=None, error=None):
+        """Feed a remote request's outcome to its circuit breaker (cancelled requests don't count)"""
+        breaker = self.breakers.get(backend.name)
+        if breaker is None or isinstance(error, TranscriptionCancelled):
+            return
+        if error is not None:
+            breaker.record_failure()
+        else:
+            breaker.record_success(seconds, audio_seconds)
+    
+    def format_backend_health(self):
+        """One-line circuit breaker state of each remote backend"""
+        return ", ".join(f"{name} {breaker.describe()}" for name, breaker in self.breakers.items())
+    
+    def transcribe_in_pieces(self, audio_file_path, verbose=True, compression=1.0, metrics=None):
+        """Split a long recording at silence and transcribe the pieces concurrently"""
+        from chunking import split_wav, transcribe_pieces, merge_transcripts
+        
+        # Compressed uploads let each WAV piece be proportionally larger (with headroom)
+        piece_bytes = self.config['piece_max_mb'] * 1024 * 1024
+        if compression > 1.0:
+            piece_bytes *= compression * 0.8
+        paths = split_wav(
+            audio_file_path,
+            int(piece_bytes),
+            overlap_seconds=self.config['piece_overlap_seconds']
+        )
+        if verbose:
+            print(f"Split into {len(paths)} pieces, uploading up to {self.config['upload_concurrency']} at a time...")
+        
+        # Each piece falls back to local transcription on its own if the API fails
+        texts = transcribe_pieces(
+            paths,
+            lambda path: self.transcribe_file(path, verbose=False, metrics=metrics),
+            max_workers=self.config['upload_concurrency']
+        )
+        
+        failed = [i + 1 for i, text in enumerate(texts) if text is None]
+        if failed:
+            logger.error(f"Pieces {failed} of {len(texts)} could not be transcribed")
+            if verbose:
+                print(f"ERROR: {len(failed)} of {len(texts)} pieces could not be transcribed")
+            return None
+        
+        return merge_transcripts(texts)
     
     def process_recording(self):
-        """Process the entire recording with smart fallback"""
-        temp_filename = None
-        self._transcription_successful = False
+        """Process the current recording in the foreground with smart fallback"""
+        sink, segmenter, metrics = self.sink, self.segmenter, self.metrics
+        self.sink, self.segmenter, self.metrics = None, None, None
         
         try:
-            # Create a temporary WAV file
-            with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as temp_wav:
-                temp_filename = temp_wav.name
-            
-            logger.info(f"Saving recording to temporary file: {temp_filename}")
-            print(f"Saving recording to temporary file...")
-            
-            # Save all frames to the temporary WAV file
-            wf = wave.open(temp_filename, 'wb')
-            wf.setnchannels(self.config['channels'])
-            wf.setsampwidth(self.pyaudio_instance.get_sample_size(self.config['format']))
-            wf.setframerate(self.config['rate'])
-            wf.writeframes(b''.join(self.frames))
-            wf.close()
+            # A file sink holds a finished WAV; a memory sink's buffer is transcribed where it is
+            with metrics.stage('wav_write'):
+                audio = sink.audio()
+            logger.info(f"Recording available at: {audio.path or 'memory'}")
+        except Exception as e:
+            logger.error(f"Error processing recording: {e}")
+            print(f"ERROR: Error processing recording: {e}")
+            return
+        
+        self.process_audio(audio, segmenter, stop_time=self.stop_time, metrics=metrics)
+        # The WAV was deleted or kept as a failed recording; release any memory buffer
+        sink.discard()
+    
+    def enqueue_recording(self):
+        """Hand the current recording to the background job queue and return"""
+        sink, segmenter, metrics = self.sink, self.segmenter, self.metrics
+        self.sink, self.segmenter, self.metrics = None, None, None
+        
+        try:
+            with metrics.stage('wav_write'):
+                audio_path = sink.wav_path()
+            job = self.job_queue.submit(
+                audio_path,
+                stop_time=self.stop_time,
+                context={'segmenter': segmenter, 'metrics': metrics}
+            )
+            sink.discard()
+            print(f"Queued for transcription (job {job['id']}, {self.job_queue.depth()} in queue)")
+        except Exception as e:
+            logger.error(f"Error queueing recording: {e}")
+            print(f"ERROR: Could not queue recording: {e}")
+            if segmenter:
+                segmenter.cancel()
+    
+    def run_job(self, job, set_state):
+        """Job queue handler: trim -> encode -> transcribe -> format -> save"""
+        context = self.job_queue.context(job['id'])
+        saved_file = self.process_audio(
+            job['audio_path'],
+            context.get('segmenter'),
+            stop_time=job.get('stop_time'),
+            interactive=False,
+            on_stage=set_state,
+            metrics=context.get('metrics')
+        )
+        if saved_file:
+            set_state('done', result_file=saved_file)
+        return saved_file is not None
+    
+    def process_audio(self, audio_path, segmenter=None, stop_time=None, interactive=True, on_stage=None, metrics=None,
+                      output_dir=None):
+        """Transcribe a recording (a WAV path or PcmAudio) and save the result.
+        
+        On success the audio file is deleted; otherwise it is kept in output_dir
+        (the configured one unless given) as a failed_recording_*.wav for manual
+        processing, or a no_speech_*.wav if VAD found no speech in it. Audio held
+        in memory is only written out in those cases.
+        Returns the saved transcription path or None.
+        """
+        on_stage = on_stage or (lambda state, **fields: None)
+        output_dir = output_dir or self.config['output_dir']
+        if metrics is None:
+            # Resumed jobs have no capture metrics, but still get measured from here on
+            metrics = RecordingMetrics() if self.metrics_writer else NullMetrics()
+        saved_file = None
+        no_speech = False
+        
+        # Local transcription is written to the markdown file segment by segment
+        progressive = None
+        if self.config['progressive_output']:
+            progressive = ProgressiveWriter(
+                lambda: self.new_transcription_path(output_dir),
+                self.transcription_header(),
+                timestamps=self.config['segment_timestamps'],
+                echo=self.config['echo_transcripts']
+            )
+            if stop_time is not None:
+                progressive.on_first_text = lambda: metrics.set(first_text_seconds=round(time.time() - stop_time, 3))
+        
+        try:
+            transcript_text = None
+            if segmenter:
+                # Earlier segments were transcribed while recording; only the last one is left
+                on_stage('transcribing')
+                if interactive:
+                    print(f"Finishing streamed transcription ({segmenter.segment_count + 1} segments)...")
+                with metrics.stage('segments_wait'):
+                    transcript_text = segmenter.finish()
+                if transcript_text is None:
+                    logger.warning("Some segments failed. Transcribing the full recording instead...")
             
-            # Check file size and warn if too large
-            file_size = os.path.getsize(temp_filename)
-            if file_size > 25 * 1024 * 1024:  # 25MB limit
-                print(f"WARNING: File size ({file_size / 1024 / 1024:.1f}MB) exceeds OpenAI limit (25MB)")
-                print("Falling back to local transcription...")
-                transcript_text = self.transcribe_locally(temp_filename)
-            else:
-                # Try OpenAI API first
-                logger.info("Sending audio to OpenAI Whisper API...")
-                print("Sending audio to OpenAI for transcription...")
-                
-                try:
-                    with open(temp_filename, "rb") as audio_file:
-                        transcript = self.client.audio.transcriptions.create(
-                            model="whisper-1",
-                            file=audio_file,
-                            language=self.config['language']
+            if transcript_text is None:
+                # Trim silence first; silent recordings skip transcription entirely
+                on_stage('trimming')
+                audio, has_speech = self.trim_recording(audio_path, verbose=interactive, metrics=metrics)
+                if has_speech:
+                    try:
+                        transcript_text = self.transcribe_file(
+                            audio, verbose=interactive, on_stage=on_stage, metrics=metrics,
+                            on_segment=progressive.add if progressive else None
                         )
-                    
-                    transcript_text = transcript.text
-                    
-                except Exception as api_error:
-                    logger.error(f"OpenAI API error: {api_error}")
-                    print(f"OpenAI API failed: {api_error}")
-                    print("Falling back to local transcription...")
-                    transcript_text = self.transcribe_locally(temp_filename)
+                    finally:
+                        if audio is not audio_path:
+                            audio.discard()
+                else:
+                    no_speech = True
             
             # Process the transcription result
-            if transcript_text and transcript_text.strip():
-                self._transcription_successful = True
-                saved_file = self.save_transcription(transcript_text)
+            if no_speech:
+                print("No speech detected - nothing to transcribe.")
+                on_stage('done', result_file="(no speech)")
+            elif transcript_text and transcript_text.strip():
+                saved_file = self.save_transcription(transcript_text, interactive=interactive, on_stage=on_stage,
+                                                     metrics=metrics, progressive=progressive, output_dir=output_dir)
+                if saved_file and stop_time is not None:
+                    latency = time.time() - stop_time
+                    metrics.set(stop_to_file_seconds=round(latency, 3))
+                    logger.info(f"Stop-to-markdown latency: {latency:.2f}s")
                 
                 if self.config['auto_open'] and saved_file and os.path.exists(saved_file):
                     self.open_file(saved_file)
             else:
                 logger.warning("Received empty transcription")
                 print("WARNING: Received empty transcription")
-                self._transcription_successful = False
         
         except Exception as e:
             logger.error(f"Error processing recording: {e}")
             print(f"ERROR: Error processing recording: {e}")
         
         finally:
-            # Cleanup logic
-            if temp_filename and os.path.exists(temp_filename):
-                if hasattr(self, '_transcription_successful') and self._transcription_successful:
+            # A partial live transcript that wasn't completed is removed
+            if progressive is not None and progressive.started:
+                progressive.discard()
+            
+            # Cleanup logic (audio held in memory only gets a file if it has to be kept)
+            if isinstance(audio_path, PcmAudio):
+                if not saved_file:
                     try:
-                        os.unlink(temp_filename)
+                        audio_path.wav_path()
+                    except Exception as e:
+                        logger.error(f"Error writing failed recording: {e}")
+                audio_path = audio_path.path
+            if audio_path and os.path.exists(audio_path):
+                if saved_file:
+                    try:
+                        os.unlink(audio_path)
                         logger.info("Cleaned up temporary file after successful transcription")
                     except Exception as e:
                         logger.error(f"Error deleting temporary file: {e}")
+                elif no_speech:
+                    # VAD is a heuristic; keep the audio in case it got a quiet recording wrong
+                    self.save_failed_recording(audio_path, output_dir, prefix="no_speech")
                 else:
-                    # Save failed recording to transcriptions directory for manual processing
-                    failed_filename = os.path.join(self.config['output_dir'], f"failed_recording_{datetime.now().strftime('%Y%m%d_%H%M%S')}.wav")
-                    try:
-                        import shutil
-                        shutil.move(temp_filename, failed_filename)
-                        logger.info(f"Saved failed recording to: {failed_filename}")
-                        print(f"\nRecording saved for manual processing: {failed_filename}")
-                        print("You can try transcribing this file manually or with other tools.")
-                    except Exception as e:
-                        logger.error(f"Error saving failed recording: {e}")
-                        print(f"ERROR: Could not save recording file: {e}")
-                        print(f"Temp file location: {temp_filename}")
+                    self.save_failed_recording(audio_path, output_dir)
+            
+            metrics.set(status='saved' if saved_file else 'no_speech' if no_speech else 'failed')
+            if self.metrics_writer and isinstance(metrics, RecordingMetrics):
+                self.metrics_writer.write(metrics)
+        
+        return saved_file
     
-    def save_transcription(self, text):
-        """Save the transcribed text to a file"""
+    def save_failed_recording(self, audio_path, output_dir=None, prefix="failed_recording"):
+        """Keep a recording that couldn't be transcribed in output_dir"""
+        failed_filename = None
         try:
-            # Format the text
-            formatted_text = self.format_text(text)
-            
-            # Create filename with current date and time
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = os.path.join(self.config['output_dir'], f"transcription_{timestamp}.md")
-            
-            # Format the content
-            content = "# Transcription " + datetime.now().strftime("%Y-%m-%d %H:%M:%S") + "\n\n"
-            content += formatted_text
-            
-            # Save to file
-            with open(filename, 'w', encoding='utf-8') as f:
-                f.write(content)
+            failed_filename = self.new_output_path(prefix, ".wav", output_dir)
+            try:
+                os.replace(audio_path, failed_filename)  # Over the empty placeholder
+            except OSError:
+                import shutil
+                shutil.copyfile(audio_path, failed_filename)  # Another filesystem
+                os.unlink(audio_path)
+            logger.info(f"Saved recording to: {failed_filename}")
+            print(f"\nRecording saved for manual processing: {failed_filename}")
+            print("You can try transcribing this file manually or with other tools.")
+            return failed_filename
+        except Exception as e:
+            logger.error(f"Error saving failed recording: {e}")
+            print(f"ERROR: Could not save recording file: {e}")
+            print(f"Temp file location: {audio_path}")
+            if failed_filename and os.path.exists(audio_path) and os.path.exists(failed_filename):
+                os.unlink(failed_filename)
+            return None
+    
+    def new_transcription_path(self, output_dir=None):
+        """A transcription_<timestamp>.md path in output_dir (unique if jobs finish in the same second)"""
+        return self.new_output_path("transcription", ".md", output_dir)
+    
+    def new_output_path(self, prefix, extension, output_dir=None):
+        """Claim a <prefix>_<timestamp><extension> path in output_dir, adding _2, _3... if it is taken"""
+        output_dir = output_dir or self.config['output_dir']
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        with self._path_lock:
+            suffix = 1
+            while True:
+                name = f"{prefix}_{timestamp}{extension}" if suffix == 1 else f"{prefix}_{timestamp}_{suffix}{extension}"
+                filename = os.path.join(output_dir, name)
+                try:
+                    # Create the file so a concurrent job (or process) can't pick the name too
+                    os.close(os.open(filename, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                    return filename
+                except FileExistsError:
+                    suffix += 1
+    
+    def transcription_header(self):
+        return "# Transcription " + datetime.now().strftime("%Y-%m-%d %H:%M:%S") + "\n\n"
+    
+    def save_transcription(self, text, interactive=True, on_stage=None, metrics=None, progressive=None,
+                           output_dir=None):
+        """Save the transcribed text to a file in output_dir (the configured one unless given).
+        
+        If progressive already holds this whole transcript (written live as it
+        was decoded), that file is completed instead of writing a new one.
+        """
+        metrics = metrics or NullMetrics()
+        try:
+            if progressive is not None and progressive.started and progressive.raw_text() == text:
+                if on_stage:
+                    on_stage('saving')
+                with metrics.stage('save'):
+                    filename = progressive.finish()
+                formatted_text = None  # Already shown as it was written
+            else:
+                # Format the text
+                if on_stage:
+                    on_stage('formatting')
+                with metrics.stage('format'):
+                    formatted_text = self.format_text(text)
+                
+                if on_stage:
+                    on_stage('saving')
+                filename = self.new_transcription_path(output_dir)
+                content = self.transcription_header() + formatted_text
+                
+                # Save to file
+                with metrics.stage('save'):
+                    with open(filename, 'w', encoding='utf-8') as f:
+                        f.write(content)
             
             logger.info(f"Transcription saved to: {filename}")
+            # The index only covers the configured output_dir
+            if self.index is not None and os.path.samefile(os.path.dirname(filename) or '.', self.config['output_dir']):
+                try:
+                    self.index.add(filename)
+                except Exception as e:
+                    logger.error(f"Could not index {filename}: {e}")
             
             # Show output in terminal
             print("\n" + "=" * 60)
             print("TRANSCRIPTION COMPLETE")
             print("=" * 60)
             print(f"\nFile saved to: {os.path.abspath(filename)}")
-            print("\nTranscription content:")
-            print("-" * 60)
-            print(formatted_text)
-            print("-" * 60 + "\n")
+            if formatted_text is not None and self.config['echo_transcripts']:
+                print("\nTranscription content:")
+                print("-" * 60)
+                print(formatted_text)
+                print("-" * 60 + "\n")
             
-            # Ask if user wants to open the file
-            if not self.config['auto_open']:
+            # Ask if user wants to open the file (never from a background job)
+            if interactive and not self.config['auto_open']:
                 print("Would you like to open this file? (y/n): ", end="", flush=True)
                 response = input().strip().lower()
                 if response == 'y':
@@ -456,24 +1268,45 @@ class TranscriptionTool:
         if self.recording:
             self.stop_recording()
         
+        # Release an armed mic
+        self.close_capture()
+        self.preroll = None
+        
+        # Stop job workers; unfinished jobs stay on disk and resume next start
+        if self.job_queue is not None:
+            pending = self.job_queue.depth()
+            self.job_queue.stop()
+            if pending:
+                print(f"{pending} job(s) still pending; they will resume on next start.")
+        
         # Close PyAudio instance
         if self.pyaudio_instance:
             self.pyaudio_instance.terminate()
             self.pyaudio_instance = None
         
+        if self.index is not None:
+            self.index.close()
+        
         # Unhook keyboard
-        keyboard.unhook_all()
+        if 'keyboard' in sys.modules:
+            sys.modules['keyboard'].unhook_all()
         
         logger.info("Cleanup completed")
     
     def display_menu(self):
         """Display the menu with options"""
+        if self.job_queue is not None:
+            print(f"\nJob queue: {self.format_job_stats()}")
+        if self.breakers:
+            print(f"Backends: {self.format_backend_health()}")
         print("\nOptions:")
         print("  1. Start/stop recording (F8)")
         print("  2. View saved transcriptions")
         print("  3. Toggle auto-open files")
-        print("  4. Exit (ESC)")
-        print("\nEnter option (1-4): ", end="", flush=True)
+        print("  4. View job queue")
+        print("  5. Re-render a cached transcription")
+        print("  6. Exit (ESC)")
+        print("\nEnter option (1-6): ", end="", flush=True)
         
         choice = input().strip()
         if choice == '1':
@@ -483,9 +1316,71 @@ class TranscriptionTool:
         elif choice == '3':
             self.toggle_auto_open()
         elif choice == '4':
+            self.list_jobs()
+        elif choice == '5':
+            self.rerender_cached()
+        elif choice == '6':
             return False
         return True
     
+    def format_job_stats(self):
+        """One-line summary of queue depth and job states"""
+        stats = self.job_queue.stats()
+        if not stats:
+            return "empty"
+        states = ", ".join(f"{count} {state}" for state, count in sorted(stats.items()))
+        return f"{self.job_queue.depth()} in queue ({states})"
+    
+    def list_jobs(self):
+        """Show background transcription jobs and their states"""
+        if self.job_queue is None:
+            print("\nBackground jobs are disabled.")
+            return
+        
+        jobs = self.job_queue.jobs()
+        if not jobs:
+            print("\nNo jobs.")
+            return
+        
+        print("\nTranscription Jobs:")
+        print("-" * 60)
+        for job in jobs:
+            created = datetime.fromtimestamp(job['created']).strftime("%Y-%m-%d %H:%M:%S")
+            detail = job.get('result_file') or job.get('error') or ""
+            print(f"{job['id']} - {created} - {job['state'].upper()} {detail}")
+    
+    def rerender_cached(self):
+        """Save a new markdown file from a cached transcript (e.g. after changing formatting)"""
+        if self.cache is None:
+            print("\nThe transcript cache is disabled.")
+            return
+        
+        entries = self.cache.entries()[:20]
+        if not entries:
+            print("\nNo cached transcriptions.")
+            return
+        
+        print("\nCached Transcriptions (most recently used first):")
+        print("-" * 60)
+        for i, entry in enumerate(entries, 1):
+            created = datetime.fromtimestamp(entry['created']).strftime("%Y-%m-%d %H:%M:%S")
+            preview = entry['text'].strip()[:40]
+            print(f"{i}. {created} - {entry.get('backend') or 'pieces'} - {entry.get('audio_seconds', 0):.0f}s - {preview}...")
+        
+        print("\nEnter number to re-render, or 0 to return: ", end="", flush=True)
+        choice = input().strip()
+        if choice == '0':
+            return
+        
+        try:
+            index = int(choice) - 1
+            if 0 <= index < len(entries):
+                self.save_transcription(entries[index]['text'])
+            else:
+                print("Invalid selection.")
+        except ValueError:
+            print("Please enter a number.")
+    
     def toggle_auto_open(self):
         """Toggle auto-open setting"""
         self.config['auto_open'] = not self.config['auto_open']
@@ -494,7 +1389,66 @@ class TranscriptionTool:
         self.save_config()
     
     def list_transcriptions(self):
-        """List and optionally open saved transcriptions"""
+        """Page through, search and open saved transcriptions"""
+        if self.index is None:
+            return self.list_transcription_files()
+        
+        self.index.reconcile()
+        page_size = self.config['list_page_size']
+        words, since, until, page = None, None, None, 0
+        while True:
+            rows, total = self.index.search(words, since, until, limit=page_size, offset=page * page_size)
+            if not total:
+                print("\nNo transcriptions found.")
+                if words is None and since is None:
+                    return
+            else:
+                pages = (total + page_size - 1) // page_size
+                title = f"Matches for '{words}'" if words else "Saved Transcriptions"
+                print(f"\n{title} (page {page + 1} of {pages}, {total} total):")
+                print("-" * 60)
+                for i, (name, mtime, snippet) in enumerate(rows, 1):
+                    time_str = datetime.fromtimestamp(mtime).strftime("%Y-%m-%d %H:%M:%S")
+                    print(f"{i}. {name} - {time_str}")
+                    if snippet:
+                        print(f"     {' '.join(snippet.split())}")
+            
+            print("\nNumber to open, n/p for next/previous page, s <words> to search,")
+            print("d <from> [<to>] for a date range (YYYY-MM-DD), a for all, 0 to return: ", end="", flush=True)
+            choice = input().strip()
+            command, _, argument = choice.partition(" ")
+            
+            if choice == '0':
+                return
+            elif command == 'n':
+                if (page + 1) * page_size < total:
+                    page += 1
+            elif command == 'p':
+                page = max(0, page - 1)
+            elif command == 's':
+                words, page = argument.strip() or None, 0
+            elif command == 'd':
+                try:
+                    dates = argument.split()
+                    since = datetime.strptime(dates[0], "%Y-%m-%d").timestamp()
+                    until = datetime.strptime(dates[-1], "%Y-%m-%d").timestamp() + 24 * 60 * 60
+                    page = 0
+                except (IndexError, ValueError):
+                    print("Please enter dates as YYYY-MM-DD.")
+            elif command == 'a':
+                words, since, until, page = None, None, None, 0
+            else:
+                try:
+                    index = int(choice) - 1
+                    if 0 <= index < len(rows):
+                        self.open_file(os.path.join(self.config['output_dir'], rows[index][0]))
+                        return
+                    print("Invalid selection.")
+                except ValueError:
+                    print("Invalid option.")
+    
+    def list_transcription_files(self):
+        """List and optionally open saved transcriptions (without the index)"""
         transcriptions = []
         
         for file in os.listdir(self.config['output_dir']):
@@ -544,15 +1498,46 @@ class TranscriptionTool:
         
         # Get preferred audio device
         self.preferred_device_id = self.get_preferred_device()
+        self.startup.mark('device')
         
         if self.preferred_device_id is None:
             logger.error("No audio input device selected. Exiting.")
             print("ERROR: No audio input device selected. Exiting.")
             return
         
+        # Open the mic now so F8 starts recording without waiting for the device
+        if self.config['armed_capture'] and self.arm_capture():
+            self.startup.mark('mic')
+        
         # Register the hotkeys
+        import keyboard
         keyboard.add_hotkey(self.config['hotkey'], self.on_hotkey_press)
         keyboard.add_hotkey('m', self.display_menu)
+        self.startup.mark('hotkeys')
+        
+        # Start background workers and pick up jobs left over from the last run
+        if self.job_queue is not None:
+            # A recording cut off by a crash never became a job; its WAV is valid up to the crash
+            for file in os.listdir(self.job_queue.jobs_dir):
+                if file.startswith(CAPTURE_PREFIX):
+                    path = os.path.join(self.job_queue.jobs_dir, file)
+                    if os.path.getsize(path) > 44:  # More than a WAV header
+                        self.save_failed_recording(path)
+                    else:
+                        os.unlink(path)
+            resumed = self.job_queue.resume()
+            self.job_queue.start()
+            if resumed:
+                print(f"Resuming {resumed} unfinished transcription job(s)")
+            self.startup.mark('jobs')
+        
+        # Pick up transcriptions added or removed while we weren't running
+        if self.index is not None:
+            index_thread = threading.Thread(target=self.index.reconcile, name="index-reconcile")
+            index_thread.daemon = True
+            index_thread.start()
+        
+        logger.info(self.startup.summary())
         
         try:
             # Keep the program running
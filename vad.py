@@ -0,0 +1,133 @@
+import logging
+
+import numpy as np
+
+logger = logging.getLogger("vad")
+
+FRAME_MS = 30
+BLOCK_FRAMES = 2000  # Frames analysed per block, keeps temporary arrays small
+SILENCE_CONTRAST = 8.0  # Loud frames must be this many times the noise floor for it to be silence
+
+
+def frame_features(samples, frame_len):
+    """Per-frame mean absolute level and zero-crossing rate.
+
+    samples is a mono int16 array. Work is done in blocks of frames so that
+    hour-long recordings don't need int32 copies of the whole signal.
+    """
+    n_frames = len(samples) // frame_len
+    energy = np.empty(n_frames, dtype=np.float32)
+    zcr = np.empty(n_frames, dtype=np.float32)
+    for start in range(0, n_frames, BLOCK_FRAMES):
+        end = min(n_frames, start + BLOCK_FRAMES)
+        block = samples[start * frame_len:end * frame_len].reshape(end - start, frame_len).astype(np.int32)
+        energy[start:end] = np.abs(block).mean(axis=1)
+        signs = np.signbit(block)
+        zcr[start:end] = (signs[:, 1:] != signs[:, :-1]).mean(axis=1)
+    return energy, zcr
+
+
+def speech_mask(energy, zcr, level=200, noise_ratio=2.5, use_zcr=False, hangover_frames=10, padding_frames=7):
+    """Boolean speech decision per frame.
+
+    A frame is speech when its level is above the fixed level. When the
+    recording has real silence in it (the 95th percentile frame is
+    SILENCE_CONTRAST times the 5th, the noise floor), it must also be above
+    noise_ratio times the noise floor. Audio without pauses is thus never cut
+    just for being the quieter part. With use_zcr, quieter frames with a
+    fricative-like zero-crossing rate also count. Speech is then extended
+    forward by the hangover and backward by the padding so word onsets and
+    tails aren't clipped.
+    """
+    if len(energy) == 0:
+        return np.zeros(0, dtype=bool)
+
+    noise_floor, loud = np.percentile(energy, (5, 95))
+    threshold = level
+    if loud >= noise_floor * SILENCE_CONTRAST:
+        threshold = max(level, noise_floor * noise_ratio)
+    mask = energy > threshold
+    if use_zcr:
+        mask |= (energy > threshold / 2) & (zcr > 0.25) & (zcr < 0.6)
+
+    # Dilate: frame i is speech if any frame in [i - hangover, i + padding] is
+    counts = np.concatenate(([0], np.cumsum(mask)))
+    idx = np.arange(len(mask))
+    lo = np.maximum(0, idx - hangover_frames)
+    hi = np.minimum(len(mask), idx + padding_frames + 1)
+    return (counts[hi] - counts[lo]) > 0
+
+
+def keep_mask(speech, max_pause_frames):
+    """Frames to keep: speech, minus leading/trailing silence, with internal
+    pauses longer than max_pause_frames shortened to max_pause_frames"""
+    keep = speech.copy()
+    if not speech.any():
+        return keep
+
+    # Start/end of each silent run
+    padded = np.concatenate(([True], speech, [True])).astype(np.int8)
+    edges = np.diff(padded)
+    run_starts = np.flatnonzero(edges == -1)
+    run_ends = np.flatnonzero(edges == 1)
+
+    half = max_pause_frames // 2
+    for start, end in zip(run_starts, run_ends):
+        if start == 0 or end == len(speech):
+            continue  # leading/trailing silence is dropped entirely
+        if end - start <= max_pause_frames:
+            keep[start:end] = True
+        else:
+            keep[start:start + half] = True
+            keep[end - (max_pause_frames - half):end] = True
+    return keep
+
+
+def trim_pcm(pcm, channels, sample_width, rate, level=200, noise_ratio=2.5, use_zcr=False,
+             hangover_seconds=0.3, padding_seconds=0.2, max_pause_seconds=1.0, min_removed_seconds=0.5):
+    """Trim silence from raw PCM.
+
+    Returns (trimmed_pcm, stats); trimmed_pcm is a bytes-like view of the kept
+    frames, or None when no speech was found. When less than
+    min_removed_seconds would go, pcm itself is returned and nothing is copied.
+    stats has original_seconds, kept_seconds and removed_seconds.
+    """
+    if sample_width != 2:
+        raise ValueError("VAD only supports 16-bit audio")
+
+    samples = np.frombuffer(pcm, dtype=np.int16)
+    frames = samples[:len(samples) - len(samples) % channels].reshape(-1, channels)
+    mono = frames[:, 0] if channels == 1 else frames.mean(axis=1).astype(np.int16)
+
+    frame_len = max(1, int(rate * FRAME_MS / 1000))
+    energy, zcr = frame_features(mono, frame_len)
+    frames_per_second = 1000 / FRAME_MS
+    speech = speech_mask(
+        energy, zcr, level, noise_ratio, use_zcr,
+        hangover_frames=int(hangover_seconds * frames_per_second),
+        padding_frames=int(padding_seconds * frames_per_second)
+    )
+    keep = keep_mask(speech, int(max_pause_seconds * frames_per_second))
+
+    original_seconds = len(frames) / rate
+    if not keep.any():
+        return None, {'original_seconds': original_seconds, 'kept_seconds': 0.0, 'removed_seconds': original_seconds}
+
+    # Runs of kept frames as sample ranges; the partial frame at the end follows the last frame
+    edges = np.flatnonzero(np.diff(np.concatenate(([False], keep, [False])).astype(np.int8)))
+    runs = (edges * frame_len).reshape(-1, 2)
+    if keep[-1]:
+        runs[-1, 1] = len(frames)
+
+    kept_seconds = int((runs[:, 1] - runs[:, 0]).sum()) / rate
+    stats = {
+        'original_seconds': original_seconds,
+        'kept_seconds': kept_seconds,
+        'removed_seconds': original_seconds - kept_seconds,
+    }
+    if stats['removed_seconds'] < min_removed_seconds:
+        return pcm, stats  # Not worth a second copy of the audio
+    trimmed = np.concatenate([frames[start:end] for start, end in runs])
+    return memoryview(trimmed).cast('B'), stats
+
+